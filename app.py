@@ -10,9 +10,9 @@ st.set_page_config(
 )
 
 from utils.helpers import load_environment_variables
-from utils.schedule import load_sarimax_model
+from utils.registry import get_scheduler_model, get_llm, get_feedback_writer
+from utils.writebehind import write_behind_enabled
 from components import render_statistics_page, render_collection_page, render_flashcard_page, render_login_page, render_sidebar
-from utils.llms import GeminiFlash
 
 
 load_environment_variables()
@@ -20,8 +20,6 @@ load_environment_variables()
 # Kiểm tra nếu chưa có dữ liệu flashcards trong session_state
 if "flashcards" not in st.session_state:
     st.session_state.flashcards = []
-if "sarimax_model" not in st.session_state:
-    st.session_state.sarimax_model = load_sarimax_model()
 if "index" not in st.session_state:
     st.session_state.index = 0
 if "show_back" not in st.session_state:
@@ -32,8 +30,6 @@ if "edit_mode" not in st.session_state:
     st.session_state.edit_mode = {}  # Lưu trạng thái chỉnh sửa cho từng ghi chú
 if "current_page" not in st.session_state:
     st.session_state.current_page = "login"  # Trang hiện tại
-if "llm" not in st.session_state:
-    st.session_state.llm = GeminiFlash()
 if "extracted_flashcards" not in st.session_state:
     st.session_state.extracted_flashcards = []
 if "flashcard_edit_mode" not in st.session_state:
@@ -47,6 +43,14 @@ if "ai_note_content" not in st.session_state:
 if "authenticated" not in st.session_state:
     st.session_state.authenticated = ""
 
+# Mô hình lập lịch và LLM dùng chung cho cả tiến trình (xem utils/registry.py),
+# gán lại mỗi lần chạy để phiên nhận bản mới sau khi nạp lại
+st.session_state.sarimax_model = get_scheduler_model(user_id=st.session_state.user_id or None)
+st.session_state.llm = get_llm()
+# Khởi động luồng ghi nền (đẩy nốt phản hồi còn trong log từ lần chạy trước)
+if write_behind_enabled():
+    get_feedback_writer()
+
 # App default
 render_sidebar()
 
@@ -0,0 +1,81 @@
+# So sánh tốc độ parse + sắp xếp bộ thẻ của `load_flashcards`: cách cũ (parse từng thẻ,
+# sort với lambda 3 phần) và cách mới (parse cả cột + `np.lexsort`), kiểm tra cùng thứ tự.
+#
+#   python benchmarks/flashcard_sort.py --sizes 10000,100000
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.database import parse_flashcards, sort_flashcards
+
+
+# Cách cũ trong `load_flashcards`, giữ nguyên để đối chiếu
+def legacy_parse_and_sort(flashcards, today):
+    for card in flashcards:
+        gold_time_raw = card.get('gold_time')
+        card['gold_time'] = pd.to_datetime(gold_time_raw, errors='coerce') if gold_time_raw else pd.NaT
+
+    flashcards.sort(
+        key=lambda x: (
+            ((x['gold_time'] - today).days if pd.notna(x['gold_time']) and x['gold_time'] < today else float('inf')),
+            (x['gold_time'] if pd.notna(x['gold_time']) and x['gold_time'] >= today else float('inf')),
+            (-x['gold_time'].toordinal() if pd.notna(x['gold_time']) else 0)
+        )
+    )
+    return flashcards
+
+
+# Bộ thẻ giả như dữ liệu Supabase trả về: gold_time trải từ 60 ngày trước tới 60 ngày sau.
+# Không sinh thẻ thiếu gold_time vì cách cũ không so sánh được thẻ đó với thẻ chưa đến
+# hạn (Timestamp vs float) và trả về danh sách rỗng.
+def make_deck(size, seed):
+    rng = np.random.default_rng(seed)
+    now = pd.Timestamp.now().floor('s')
+    offsets = rng.uniform(-60, 60, size)
+    deck = []
+    for i, offset in enumerate(offsets):
+        gold_time = (now + pd.Timedelta(days=float(offset))).strftime('%Y-%m-%d %H:%M:%S')
+        deck.append({'id': i, 'word': f'word-{i}', 'gold_time': gold_time})
+    return deck
+
+
+def timed(function, deck, now, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        cards = [dict(card) for card in deck]
+        started = time.perf_counter()
+        result = function(cards, now)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def vectorized_parse_and_sort(flashcards, now):
+    return sort_flashcards(parse_flashcards(flashcards), now)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parse + sắp xếp bộ thẻ")
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'số thẻ':>8}{'cũ (ms)':>12}{'mới (ms)':>12}{'nhanh hơn':>12}  cùng thứ tự")
+    for size in (int(value) for value in args.sizes.split(",")):
+        deck = make_deck(size, args.seed)
+        # Cùng một mốc "hiện tại" cho cả hai cách để thứ tự so sánh được
+        now = pd.Timestamp.now()
+        legacy_time, legacy = timed(legacy_parse_and_sort, deck, now, args.repeat)
+        new_time, new = timed(vectorized_parse_and_sort, deck, now, args.repeat)
+        same = [card['id'] for card in legacy] == [card['id'] for card in new]
+        print(f"{size:>8}{legacy_time * 1000:>12.1f}{new_time * 1000:>12.1f}{legacy_time / new_time:>11.1f}x  {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# Đo bộ nhớ tiến trình khi N phiên cùng giữ mô hình lập lịch + LLM client,
+# với registry dùng chung (SHARED_REGISTRY=1) và không dùng (SHARED_REGISTRY=0).
+#
+#   python benchmarks/registry_memory.py --sessions 200 --mode live
+#
+# Mỗi cấu hình chạy trong một tiến trình con riêng để số RSS không lẫn nhau.
+
+import os
+import sys
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_sessions(sessions, mode):
+    import psutil
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    from utils.registry import registry_enabled, _shared_scheduler_model, model_version
+    from utils.schedule import load_sarimax_model
+
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+
+    held = []
+    for _ in range(sessions):
+        # Mỗi phiên giữ một tham chiếu như `st.session_state.sarimax_model`
+        if registry_enabled():
+            held.append(_shared_scheduler_model(mode, model_version(mode)))
+        else:
+            held.append(load_sarimax_model(mode))
+
+    rss_after = process.memory_info().rss
+    distinct = len({id(model) for model in held})
+    print(f"{rss_before} {rss_after} {distinct}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Đo bộ nhớ tiến trình với registry bật và tắt")
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--mode", default="live", choices=["live", "table", "compact"])
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_sessions(args.sessions, args.mode)
+        return
+
+    print(f"{args.sessions} phiên, SCHEDULER_MODE={args.mode}")
+    print(f"{'registry':<10}{'RSS trước (MiB)':>18}{'RSS sau (MiB)':>16}{'tăng (MiB)':>13}{'số bản':>9}")
+    for enabled in ("1", "0"):
+        env = dict(os.environ, SHARED_REGISTRY=enabled, SCHEDULER_MODE=args.mode)
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", "--sessions", str(args.sessions), "--mode", args.mode],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout.split()
+        before, after, distinct = (int(value) for value in output[-3:])
+        label = "bật" if enabled == "1" else "tắt"
+        print(f"{label:<10}{before / 2**20:>18.1f}{after / 2**20:>16.1f}{(after - before) / 2**20:>13.1f}{distinct:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,32 @@
 import streamlit as st
 import pandas as pd
-from utils.database import add_flashcard, load_flashcards, delete_flashcard, update_flashcard
+from utils.database import add_flashcard, bulk_add_flashcards, get_cached_flashcards, get_cached_flashcards_page, delete_flashcard, delete_flashcards, update_flashcard, update_flashcards, COLLECTION_PAGE_SIZE
 from utils.helpers import get_priority_icon
 from utils.navigate import go_to_flashcard_page
+from datetime import datetime
 
 def add_flashcard_action():
     if st.session_state["new_word"] and st.session_state["new_meaning"] and st.session_state["new_example"]:
         add_flashcard(st.session_state["new_word"], st.session_state["new_meaning"], st.session_state["new_example"])
         st.toast(f"Flashcard '{st.session_state['new_word']}' đã được thêm.", icon='🎉')
-        st.session_state.flashcards = load_flashcards()
+        st.session_state.flashcards = get_cached_flashcards()
         st.session_state["new_word"] = ""
         st.session_state["new_meaning"] = ""
         st.session_state["new_example"] = ""
     else:
         st.warning("Vui lòng nhập đầy đủ thông tin.")
 
-# Hàm lưu các flashcard đã chọn vào Supabase
+# Hàm lưu các flashcard đã chọn (một request cho cả lô, bỏ qua từ đã có trong bộ thẻ)
 def save_extracted_flashcards():
     selected_flashcards = [flashcard for flashcard in st.session_state['extracted_flashcards'] if st.session_state.get(f"select_{flashcard['word']}", False)]
-    for flashcard in selected_flashcards:
-        word = flashcard['word']
-        meaning = flashcard['meaning']
-        example = flashcard.get('example', '')
+    added, skipped = bulk_add_flashcards(selected_flashcards)
+    if added:
+        st.toast(f"Đã thêm {len(added)} flashcard.", icon='🎉')
+    if skipped:
+        st.toast(f"Bỏ qua {len(skipped)} từ đã có: {', '.join(card['word'] for card in skipped)}", icon='ℹ️')
 
-        try:
-            add_flashcard(word, meaning, example)
-            st.toast(f"Flashcard '{word}' đã được thêm.", icon='🎉')
-        except Exception as e:
-            st.error(f"Lỗi khi lưu flashcard '{word}' vào Supabase: {e}")
-            
-    # Cập nhật lại danh sách flashcards sau khi lưu
-    st.session_state.flashcards = load_flashcards()
+    # Thẻ mới đã được gộp vào bộ đệm, không cần tải lại
+    st.session_state.flashcards = get_cached_flashcards()
     st.session_state['extracted_flashcards'] = []
 
 # Wrapper function for editing a flashcard
@@ -42,7 +38,7 @@ def save_edit_flashcard_action(card_id):
         try:
             update_flashcard(card_id, updated_word, updated_meaning, updated_example)
             st.session_state.flashcard_edit_mode[card_id] = False  # Exit edit mode
-            st.session_state.flashcards = load_flashcards()  # Reload flashcards
+            st.session_state.flashcards = get_cached_flashcards()  # Reload flashcards
             st.toast(f"Flashcard '{updated_word}' đã được cập nhật.", icon='✅')
             # st.rerun()  # Rerun to refresh the page immediately
         except Exception as e:
@@ -50,12 +46,99 @@ def save_edit_flashcard_action(card_id):
     else:
         st.warning("Từ vựng, nghĩa và ví dụ không được để trống.")
         
+# Lấy lại bộ thẻ từ bộ đệm (đã được cập nhật tại chỗ) sau khi xóa/sửa hàng loạt
+def refresh_deck():
+    st.session_state.flashcards = get_cached_flashcards()
+    if st.session_state.index >= len(st.session_state.flashcards):
+        st.session_state.index = 0
+
 # Wrapper function for deleting a flashcard
 def delete_flashcard_action(card_id):
     delete_flashcard(card_id)
-    st.session_state.flashcards = load_flashcards()  # Reload flashcards to update the list
+    st.session_state.get('selected_card_ids', set()).discard(card_id)
+    refresh_deck()
     # st.rerun()  # Rerun to refresh the page immediately
 
+# Chọn / bỏ chọn một thẻ; lựa chọn được giữ trong session_state nên còn nguyên khi đổi trang
+def toggle_card_selection(card_id):
+    selected = st.session_state.setdefault('selected_card_ids', set())
+    if st.session_state.get(f"select_card_{card_id}"):
+        selected.add(card_id)
+    else:
+        selected.discard(card_id)
+
+def select_cards_action(card_ids):
+    st.session_state.setdefault('selected_card_ids', set()).update(card_ids)
+
+def clear_selection_action():
+    st.session_state.selected_card_ids = set()
+
+# Xóa mọi thẻ đã chọn (kèm ghi chú) với số request cố định
+def delete_selected_action():
+    card_ids = list(st.session_state.get('selected_card_ids', set()))
+    delete_flashcards(card_ids)
+    st.toast(f"Đã xóa {len(card_ids)} flashcard.", icon='🗑️')
+    clear_selection_action()
+    refresh_deck()
+
+# Đưa các thẻ đã chọn về đến hạn ngay (một request)
+def review_selected_now_action():
+    card_ids = list(st.session_state.get('selected_card_ids', set()))
+    update_flashcards(card_ids, {'gold_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')})
+    st.toast(f"{len(card_ids)} flashcard sẽ được ôn lại ngay.", icon='🔁')
+    clear_selection_action()
+    refresh_deck()
+
+# Các cột sửa được hàng loạt → nhãn hiển thị
+BULK_EDIT_FIELDS = {'meaning': "Nghĩa", 'example': "Ví dụ"}
+
+# Thay một cột (nghĩa hoặc ví dụ) của mọi thẻ đã chọn bằng cùng một giá trị (một request)
+def bulk_edit_selected_action():
+    card_ids = list(st.session_state.get('selected_card_ids', set()))
+    field = st.session_state.get('bulk_edit_field', 'meaning')
+    value = st.session_state.get('bulk_edit_value', '').strip()
+    if field == 'meaning' and not value:
+        st.warning("Nghĩa không được để trống.")
+        return
+    update_flashcards(card_ids, {field: value})
+    st.toast(f"Đã cập nhật {BULK_EDIT_FIELDS[field].lower()} cho {len(card_ids)} flashcard.", icon='✏️')
+    st.session_state.bulk_edit_value = ""
+    clear_selection_action()
+    refresh_deck()
+
+# Thanh thao tác hàng loạt cho các thẻ đã chọn
+def render_bulk_actions(page_card_ids):
+    selected = st.session_state.get('selected_card_ids', set())
+    col_select, col_review, col_delete, col_clear = st.columns(4)
+    with col_select:
+        st.button("☑️ Chọn cả trang", key="select_page", on_click=select_cards_action, args=(page_card_ids,), use_container_width=True)
+    with col_review:
+        st.button("🔁 Ôn lại ngay", key="review_selected", on_click=review_selected_now_action, disabled=not selected, use_container_width=True)
+    with col_delete:
+        st.button(f"🗑️ Xóa {len(selected)} thẻ", key="delete_selected", on_click=delete_selected_action, disabled=not selected, use_container_width=True)
+    with col_clear:
+        st.button("Bỏ chọn", key="clear_selection", on_click=clear_selection_action, disabled=not selected, use_container_width=True)
+    if selected:
+        with st.expander(f"✏️ Sửa {len(selected)} thẻ đã chọn", expanded=False):
+            st.selectbox("Trường:", list(BULK_EDIT_FIELDS), format_func=BULK_EDIT_FIELDS.get, key="bulk_edit_field")
+            st.text_area("Giá trị mới:", key="bulk_edit_value")
+            st.button("Áp dụng", key="bulk_edit_apply", on_click=bulk_edit_selected_action, use_container_width=True)
+
+
+# Chuyển trang trong danh sách thẻ
+def change_collection_page(step):
+    st.session_state.collection_page = max(0, st.session_state.get('collection_page', 0) + step)
+
+# Thanh điều hướng trang: ⬅️ / "Trang x/y" / ➡️
+def render_page_navigation(page, page_count, key):
+    col_prev, col_label, col_next = st.columns([1, 2, 1])
+    with col_prev:
+        st.button("⬅️", key=f"prev_page_{key}", on_click=change_collection_page, args=(-1,), disabled=page == 0, use_container_width=True)
+    with col_label:
+        st.markdown(f"<div style='text-align: center'>Trang {page + 1}/{page_count}</div>", unsafe_allow_html=True)
+    with col_next:
+        st.button("➡️", key=f"next_page_{key}", on_click=change_collection_page, args=(1,), disabled=page >= page_count - 1, use_container_width=True)
+
 
 def render_collection_page():
     
@@ -105,12 +188,30 @@ def render_collection_page():
                 plain_text = ""
                 st.session_state['extracted_flashcards'] = []
                 
-    # Logic for displaying flashcards in the collection view
-    for idx, card in enumerate(st.session_state.flashcards):
+    # Logic for displaying flashcards in the collection view: chỉ tải và dựng các thẻ
+    # của trang đang xem (COLLECTION_PAGE_SIZE thẻ mỗi trang)
+    page = st.session_state.get('collection_page', 0)
+    page_cards, total = get_cached_flashcards_page(page)
+    page_count = max(1, -(-total // COLLECTION_PAGE_SIZE))
+    if page >= page_count:
+        # Trang hiện tại không còn (ví dụ vừa xóa thẻ cuối của trang cuối)
+        page = st.session_state.collection_page = page_count - 1
+        page_cards, total = get_cached_flashcards_page(page)
+
+    selected = st.session_state.setdefault('selected_card_ids', set())
+    st.caption(f"{total} thẻ · đã chọn {len(selected)}")
+    render_bulk_actions([card['id'] for card in page_cards])
+    render_page_navigation(page, page_count, "top")
+    for card in page_cards:
         icon = get_priority_icon(card['gold_time'])
         is_editable = st.session_state.flashcard_edit_mode.get(card['id'], False)
 
-        with st.expander(f"{icon} {card['word']} - {card['meaning']}", expanded=False):
+        # Ô chọn lấy trạng thái từ `selected_card_ids` (nguồn duy nhất cho lựa chọn)
+        st.session_state[f"select_card_{card['id']}"] = card['id'] in selected
+        col_select, col_card = st.columns([1, 12])
+        with col_select:
+            st.checkbox("Chọn", key=f"select_card_{card['id']}", on_change=toggle_card_selection, args=(card['id'],), label_visibility="collapsed")
+        with col_card.expander(f"{icon} {card['word']} - {card['meaning']}", expanded=False):
             if is_editable:
                 # Chế độ chỉnh sửa
                 st.text_input("Từ vựng:", value=card['word'], key=f"edit_word_{card['id']}")
@@ -132,7 +233,10 @@ def render_collection_page():
                 with col_edit:
                     st.button("Chỉnh sửa", key=f"edit_card_{card['id']}", on_click=lambda card_id=card['id']: st.session_state.flashcard_edit_mode.update({card_id: True}), use_container_width=True)
                 with col_delete:
-                    st.button("🗑️ Xóa Flashcard", key=f"delete_card_{card['id']}", on_click=lambda card_id=card['id']: delete_flashcard_action(card['id']), use_container_width=True)
-                    
+                    st.button("🗑️ Xóa Flashcard", key=f"delete_card_{card['id']}", on_click=lambda card_id=card['id']: delete_flashcard_action(card_id), use_container_width=True)
+
+    if page_cards:
+        render_page_navigation(page, page_count, "bottom")
+
     # Nút quay lại trang flashcard_view
     st.button("🔙 Quay lại", on_click=go_to_flashcard_page, key="back_to_view2")
\ No newline at end of file
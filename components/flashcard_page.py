@@ -1,22 +1,19 @@
 import streamlit as st
 from assets.styles import FLASHCARD_VIEW_STYLE
-from utils.helpers import add_furigana, add_highlight, calculate_time_until_gold, stream_data
-from utils.database import load_flashcards, load_notes, delete_note, update_note, update_gold_time, add_note, update_study_progress
-from utils.navigate import next_card, prev_card, go_to_collection_page, go_to_statistics_page
-from utils.schedule import predict_next_gold_time
+from utils.helpers import add_furigana, add_highlight, calculate_time_until_gold
+from utils.database import get_cached_flashcards, invalidate_flashcards_cache, get_notes, invalidate_notes_cache, invalidate_study_progress_cache, delete_note, update_note, bulk_update_gold_time, add_note, update_study_progress
+from utils.navigate import next_card, prev_card, next_due_card, get_due_queue, go_to_collection_page, go_to_statistics_page
+from utils.schedule import next_review_times
 from utils.audio import generate_audio
-from datetime import datetime, timedelta
+from utils.registry import get_feedback_writer, get_note_prefetcher
+from utils.prefetch import note_prefetch_enabled, NOTE_PREFETCH_COUNT, DEFAULT_NOTE_REQUEST
+from utils.writebehind import write_behind_enabled
 import pandas as pd
-import time
 
-# Cập nhật `gold_time` trong Supabase
-def update_timestamp_by_id(card_id, gold_time):
-    try:
-        # supabase.table('flashcards').update({'gold_time': gold_time.strftime('%Y-%m-%d %H:%M:%S')}).eq('id', card_id).execute()
-        update_gold_time(card_id, gold_time.strftime('%Y-%m-%d %H:%M:%S'))
-        st.session_state.flashcards = load_flashcards()
-    except Exception as e:
-        st.error(f"Lỗi khi cập nhật dữ liệu trong Supabase: {e}")
+# Thời gian tối đa (giây) nút đồng bộ chờ luồng ghi nền đẩy hết log
+SYNC_WAIT_SECONDS = 10
+# Thời gian tối đa (giây) chờ một ghi chú AI đang được sinh trước trước khi tự sinh lại
+PREFETCH_WAIT_SECONDS = 30
 
 def update_gold_time_based_on_feedback(feedback_value):
     
@@ -27,58 +24,98 @@ def update_gold_time_based_on_feedback(feedback_value):
     if pd.isna(last_timestamp):
         last_timestamp = pd.Timestamp.now()
 
-    # Tính toán gold_time dựa trên phản hồi
-    if st.session_state.sarimax_model:
-        gold_time = predict_next_gold_time(st.session_state.sarimax_model, last_timestamp, feedback_value)
-    else:
-        gold_time = last_timestamp + timedelta(days=2)
-
     # Lưu phản hồi và gold_time vào session_state
-    st.session_state.feedback_list.append({
+    feedback = {
         'card_id': card_id,
-        'gold_time': gold_time,
+        'last_timestamp': last_timestamp,
+        'reviewed_at': pd.Timestamp.now(),
         'feedback_value': feedback_value
-    })
+    }
+    gold_time = predict_feedback_gold_times([feedback])[0]
+    st.session_state.feedback_list.append(feedback)
 
-    next_card()  # Chuyển đến thẻ tiếp theo sau khi phản hồi
+    # Chế độ online: học tiếp từ đúng lượt ôn này (cập nhật O(1)), mỗi lượt chỉ một lần,
+    # không đợi đồng bộ và không quan sát lại các phản hồi còn giữ để thử lại
+    if hasattr(st.session_state.sarimax_model, "observe_reviews"):
+        try:
+            st.session_state.sarimax_model.observe_reviews([feedback])
+            st.session_state.sarimax_model.save()
+        except Exception as e:
+            st.error(f"Lỗi khi cập nhật mô hình lập lịch: {e}")
+
+    # Ghi bền vào log cục bộ, luồng nền sẽ đẩy lên Supabase (không chờ mạng)
+    if write_behind_enabled():
+        try:
+            get_feedback_writer().enqueue(st.session_state.user_id, feedback)
+        except Exception as e:
+            st.error(f"Lỗi khi ghi phản hồi vào log cục bộ: {e}")
+
+    # Đổi lịch thẻ trong hàng đợi (không tải lại bộ thẻ), rồi chuyển đến thẻ đến hạn sớm nhất
+    # khác thẻ vừa trả lời
+    get_due_queue().reschedule(card_id, gold_time)
+    card['gold_time'] = gold_time
+    next_due_card(skip_card_id=card_id)
+
+# Tính gold_time cho các phản hồi chưa có, tất cả trong một lần dự báo
+def predict_feedback_gold_times(feedback_list):
+    pending = [feedback for feedback in feedback_list if feedback.get('gold_time') is None]
+    if pending:
+        gold_times = next_review_times(
+            st.session_state.sarimax_model or None,
+            [feedback['last_timestamp'] for feedback in pending],
+            [feedback['feedback_value'] for feedback in pending],
+            [feedback['reviewed_at'] for feedback in pending],
+        )
+        for feedback, gold_time in zip(pending, gold_times):
+            feedback['gold_time'] = gold_time
+    return [feedback['gold_time'] for feedback in feedback_list]
         
 def sync_data():
     feedback_list = st.session_state.get('feedback_list', [])
+    pending_count = get_feedback_writer().log.count(st.session_state.user_id) if write_behind_enabled() else 0
 
-    if not feedback_list:
+    if not feedback_list and not pending_count:
         st.info("Không có dữ liệu mới để đồng bộ.")
         return
 
+    gold_times = predict_feedback_gold_times(feedback_list)
+
+    # Phản hồi đã nằm trong log cục bộ: chỉ cần giục luồng nền đẩy ngay và chờ một lúc
+    if write_behind_enabled():
+        st.session_state.feedback_list = []
+        with st.spinner("Đang đồng bộ..."):
+            remaining = get_feedback_writer().flush_now(timeout=SYNC_WAIT_SECONDS, user_id=st.session_state.user_id)
+        if remaining:
+            st.warning(f"Còn {remaining} lượt ôn đang chờ ghi lên máy chủ, sẽ tự động thử lại.")
+        else:
+            st.success("Hoàn tất đồng bộ.")
+            invalidate_flashcards_cache()
+            invalidate_notes_cache()
+            invalidate_study_progress_cache()
+            st.session_state.flashcards = get_cached_flashcards()
+        return
+
     # Use st.empty() to create a dynamic placeholder for the expander
     expander_placeholder = st.empty()
 
     with expander_placeholder.expander("Đang đồng bộ..."):
         # Initialize the progress bar
         progress_bar = st.progress(0)
-        total_feedback = len(feedback_list)
-        progress_step = 1 / (total_feedback + 1)  # +1 for study_progress update
 
         # Label for showing current progress step
         status_label = st.empty()
 
-        # Prepare data to update the study_progress table
-        study_progress = {'good_count': 0, 'normal_count': 0, 'bad_count': 0}
-
-        # Sync gold_time for each card and accumulate study progress
-        for idx, feedback in enumerate(feedback_list):
-            card_id = feedback['card_id']
-            gold_time = feedback['gold_time']
+        # Prepare data to update the study_progress table, theo ngày của từng lượt ôn
+        progress_by_date = {}
+        for feedback in feedback_list:
+            # Lượt ôn đã được tính ở lần đồng bộ trước (chỉ gold_time ghi lỗi) thì bỏ qua
+            if feedback.get('progress_synced'):
+                continue
+            study_progress = progress_by_date.setdefault(
+                feedback['reviewed_at'].strftime('%Y-%m-%d'),
+                {'good_count': 0, 'normal_count': 0, 'bad_count': 0},
+            )
             feedback_value = feedback['feedback_value']
-
-            # Update gold_time in the database
-            try:
-                status_label.text(f"Đang cập nhật gold_time cho thẻ ID {card_id}...")
-                time.sleep(0.5)  # Simulate update delay
-                # Replace this line with your actual Supabase update code
-            except Exception as e:
-                st.error(f"Lỗi khi cập nhật gold_time cho flashcard ID {card_id}: {e}")
-
-            # Accumulate study progress
             if feedback_value == 1:
                 study_progress['good_count'] += 1
             elif feedback_value == 0:
@@ -86,20 +123,23 @@ def sync_data():
             elif feedback_value == -1:
                 study_progress['bad_count'] += 1
 
-            # Update the progress bar
-            progress_bar.progress(int((idx + 1) * progress_step * 100))
+        # Ghi gold_time của mọi thẻ theo lô, cập nhật tiến độ sau mỗi lô
+        def on_progress(written, total):
+            status_label.text(f"Đã cập nhật gold_time cho {written}/{total} thẻ...")
+            progress_bar.progress(int(written / total * 90))
+
+        status_label.text(f"Đang cập nhật gold_time cho {len(feedback_list)} lượt ôn...")
+        written = bulk_update_gold_time(
+            [(feedback['card_id'], gold_time) for feedback, gold_time in zip(feedback_list, gold_times)],
+            on_progress=on_progress,
+        )
 
         # Update the study_progress table
         try:
             status_label.text("Đang cập nhật tiến độ học...")
-            time.sleep(0.5)  # Simulate update delay
-            update_study_progress(
-                {
-                    "good_count": study_progress['good_count'],
-                    "normal_count": study_progress['normal_count'],
-                    "bad_count": study_progress['bad_count']
-                }
-            )
+            update_study_progress(progress_by_date)
+            for feedback in feedback_list:
+                feedback['progress_synced'] = True
 
         except Exception as e:
             st.error(f"Lỗi khi cập nhật tiến độ học: {e}")
@@ -108,11 +148,18 @@ def sync_data():
         progress_bar.progress(100)
         status_label.text("Hoàn tất đồng bộ.")
 
-    # Clear the feedback list after synchronization
-    st.session_state.feedback_list = []
+    # Giữ lại các phản hồi chưa ghi được gold_time hoặc chưa được tính vào tiến độ để lần
+    # đồng bộ sau thử lại (ghi gold_time là idempotent, tiến độ chỉ cộng phần chưa tính)
+    st.session_state.feedback_list = [
+        feedback for feedback in feedback_list
+        if feedback['card_id'] not in written or not feedback.get('progress_synced')
+    ]
 
     # Reload flashcards to update changes
-    st.session_state.flashcards = load_flashcards()  # Uncomment to reload flashcards if needed
+    invalidate_flashcards_cache()
+    invalidate_notes_cache()
+    invalidate_study_progress_cache()
+    st.session_state.flashcards = get_cached_flashcards()
 
 
 # Hàm lưu ghi chú mới vào bảng notes và session state
@@ -130,19 +177,68 @@ def save_note_action():
     else:
         st.toast("Vui lòng nhập nội dung")
 
+# Sinh trước (nền) ghi chú AI theo yêu cầu mặc định cho các thẻ sắp đến hạn, xem utils/prefetch.py
+def prefetch_upcoming_notes():
+    if not note_prefetch_enabled() or not st.session_state.get("GEMINI_KEY"):
+        return
+    cards = get_due_queue().upcoming(NOTE_PREFETCH_COUNT)
+    get_note_prefetcher().schedule(st.session_state.user_id, cards, st.session_state.llm, st.session_state.GEMINI_KEY)
+
 def take_note_with_ai_action():
-    if st.session_state["new_note_content"]:
+    request = st.session_state["new_note_content"]
+    # Khi bật sinh trước, bấm Magic mà không nhập yêu cầu thì dùng yêu cầu mặc định
+    if not request and note_prefetch_enabled():
+        request = DEFAULT_NOTE_REQUEST
+    if request:
         if st.session_state["new_note_title"] == "":
             st.session_state["new_note_title"] = "🤖 Note AI"
-        
-        note = st.session_state.llm.take_note_action()
-        add_note(st.session_state.current_card_id, st.session_state.new_note_title.strip(), note)
+
+        card = st.session_state.flashcards[st.session_state.index]
+        card = {key: card[key] for key in ('word', 'meaning', 'example')}
+        note = get_note_prefetcher().take(card, request) if note_prefetch_enabled() else None
+        if note:
+            # Ghi chú đã được sinh trước: lưu ngay
+            add_note(st.session_state.current_card_id, st.session_state.new_note_title.strip(), note)
+        else:
+            # Ghi chú được sinh (stream) khi trang vẽ lại, xem `render_ai_note_stream`
+            st.session_state.ai_note_request = {
+                'flashcard_id': st.session_state.current_card_id,
+                'card': card,
+                'title': st.session_state.new_note_title.strip(),
+                'request': request,
+            }
 
         st.session_state.new_note_title = ""
         st.session_state.new_note_content = ""
     else:
         st.toast("Vui lòng nhập nội dung")
 
+# Hiển thị ghi chú AI theo từng đoạn ngay khi model sinh ra, rồi lưu bản đầy đủ.
+# Phần stream được xóa sau khi lưu vì ghi chú đã nằm trong danh sách ghi chú.
+# Nếu ghi chú đang được sinh trước thì chờ bản đó thay vì gọi model lần nữa.
+def render_ai_note_stream():
+    request = st.session_state.pop('ai_note_request', None)
+    if request is None:
+        return
+
+    if note_prefetch_enabled():
+        with st.spinner("Đang tạo ghi chú..."):
+            note = get_note_prefetcher().take(request['card'], request['request'], timeout=PREFETCH_WAIT_SECONDS)
+        if note:
+            add_note(request['flashcard_id'], request['title'], note)
+            return
+
+    placeholder = st.empty()
+    try:
+        with placeholder.container():
+            note = st.write_stream(st.session_state.llm.stream_note(request['card'], request['request']))
+    except Exception as e:
+        st.error(f"Lỗi khi tạo ghi chú với AI: {e}")
+        return
+    if note:
+        add_note(request['flashcard_id'], request['title'], note)
+    placeholder.empty()
+
 # Hàm cập nhật ghi chú và session state
 def save_edit_note_action(note_id):
     updated_title = st.session_state.get(f"edit_note_title_{note_id}", "").strip()
@@ -165,10 +261,11 @@ def save_edit_note_action(note_id):
 
 # Lấy thẻ hiện tại dựa vào chỉ số
 def render_flashcard_page():
-    st.session_state.flashcards = load_flashcards()
+    st.session_state.flashcards = get_cached_flashcards()
     if len(st.session_state.flashcards) > 0: 
         card = st.session_state.flashcards[st.session_state.index]
         st.session_state.current_card_id = card['id']
+        prefetch_upcoming_notes()
         
         # Tùy chỉnh CSS cho hộp thẻ và nút
         st.markdown(FLASHCARD_VIEW_STYLE, unsafe_allow_html=True)
@@ -195,7 +292,8 @@ def render_flashcard_page():
 
             # Lấy và hiển thị ghi chú cho flashcard hiện tại
             st.write("### Ghi chú")
-            notes = st.session_state.get(f"notes_{card['id']}", load_notes(card['id']))
+            render_ai_note_stream()
+            notes = get_notes(card['id'])
             for note in notes:
                 note_id = note['id']
                 # Xác định nếu `edit_mode` cho note_id được bật
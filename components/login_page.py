@@ -1,5 +1,6 @@
 import streamlit as st
 from utils.auth import authenticate
+from utils.database import bootstrap_user_data
 import random
 
 # Danh sách icon mẫu
@@ -28,6 +29,8 @@ def login_action():
             st.session_state.authenticated = True
             st.session_state.user_id = user_id  # Save user ID to session state
             st.session_state.is_admin = is_admin
+            # Tải trước bộ thẻ, ghi chú và tiến độ học song song cho trang đầu tiên
+            bootstrap_user_data(user_id)
             st.session_state.current_page = "flashcard"  # Set the current page to flashcard
             st.balloons()
         else:
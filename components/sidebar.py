@@ -2,6 +2,7 @@ import streamlit as st
 import random
 import time 
 from utils.auth import logout_and_clear_state
+from utils.registry import reload_shared_resources, registry_versions
 from assets.styles import BADGE_STYLE
 
 def get_badge(is_admin):
@@ -33,5 +34,8 @@ def render_sidebar():
             on_click= lambda badge = badge : badge_action(badge),
             type="primary"
         )
+        if st.session_state.is_admin:
+            st.sidebar.button("Nạp lại mô hình", on_click=reload_shared_resources, use_container_width=True)
+            st.sidebar.caption(" · ".join(f"{name}: {version}" for name, version in registry_versions().items()))
         st.sidebar.button("Đăng xuất", on_click=logout_and_clear_state, use_container_width=True)
     
\ No newline at end of file
@@ -1,7 +1,6 @@
 import streamlit as st
 import pandas as pd
-from utils.database import load_study_progress, load_flashcards, load_all_notes
-from utils.helpers import get_priority_icon
+from utils.database import get_cached_study_progress, load_note_counts, load_status_counts
 from utils.navigate import go_to_flashcard_page
 
 def render_statistics_page():
@@ -21,8 +20,8 @@ def render_statistics_page():
         )
 
     # Card 2: Total Notes
-    all_notes = load_all_notes()
-    total_notes = len(all_notes)
+    note_counts = load_note_counts()
+    total_notes = sum(note_counts.values())
     with col2:
         st.button(
             f"{total_notes} ghi chú",
@@ -34,7 +33,7 @@ def render_statistics_page():
     
     st.divider()
     # Load study progress data
-    study_progress_df = load_study_progress()
+    study_progress_df = get_cached_study_progress()
             
     if not study_progress_df.empty:
         st.markdown("### Tiến Độ Học Tập")
@@ -62,13 +61,8 @@ def render_statistics_page():
     # 1. Biểu đồ phân phối các flashcard theo trạng thái Gold Time
     st.markdown("### Phân phối thẻ")
 
-    # Define a dictionary to count each status
-    status_counts = {'🔴': 0, '🟠': 0, '🔵': 0, '🟢': 0}
-
-    # Calculate the status counts by using get_priority_icon function
-    for card in st.session_state.flashcards:
-        icon = get_priority_icon(card['gold_time'])
-        status_counts[icon] += 1
+    # Count each status in the store (one row per bucket)
+    status_counts = load_status_counts()
 
     # Map icons to meaningful labels for the chart
     status_labels = {
@@ -90,11 +84,6 @@ def render_statistics_page():
     # 2. Biểu đồ số lượng ghi chú trên mỗi flashcard
     st.divider()
     st.markdown("### Số lượng Ghi chú")
-    note_counts = {}
-    for note in all_notes:
-        flashcard_id = note['flashcard_id']
-        note_counts[flashcard_id] = note_counts.get(flashcard_id, 0) + 1
-
     flashcard_ids = [card['id'] for card in st.session_state.flashcards]
     counts = [note_counts.get(flashcard_id, 0) for flashcard_id in flashcard_ids]
     words = [card['word'] for card in st.session_state.flashcards]
@@ -1,34 +1,164 @@
-import joblib
+# Mô phỏng phát lại (replay) luồng ôn tập qua bộ lập lịch, chạy offline.
+#
+#   python model/test.py                                   # dữ liệu tổng hợp
+#   python model/test.py --users 20 --cards 200 --days 30  # N người × M thẻ × D ngày
+#   python model/test.py --recorded reviews.csv            # phát lại log thật
+#   python model/test.py --modes table,compact --max-p99-ms 1 --check-table
+#
+# Với mỗi chế độ lập lịch (live/table/compact) in ra số lượt ôn/giây, độ trễ p50/p99
+# cho mỗi lần dự báo và số thẻ đến hạn mỗi ngày. Trả mã lỗi 1 nếu p99 vượt
+# `--max-p99-ms` hoặc bảng tra lệch `get_forecast`, để chặn hồi quy trước khi deploy.
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
 
-# Tải mô hình SARIMAX đã lưu
-loaded_model = joblib.load('model/sarimax_model.pkl')
-print("Mô hình SARIMAX đã được tải thành công")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.schedule import load_sarimax_model, next_review_time, IntervalTable, verify_interval_table
+
+# Xác suất phản hồi 😱 / 🤔 / 😎 của người học tổng hợp
+FEEDBACK_VALUES = np.array([-1, 0, 1])
+FEEDBACK_PROBS = np.array([0.2, 0.4, 0.4])
+
+
+# Sinh luồng ôn tập tổng hợp: mỗi ngày, thẻ nào đến hạn thì được ôn một lần.
+# Trả về các lượt ôn (dict) theo thứ tự thời gian, dùng chung cho mọi chế độ.
+def simulate_reviews(model, users, cards, days, start, seed):
+    rng = np.random.default_rng(seed)
+    gold_times = {
+        (user, card): start + pd.Timedelta(hours=float(rng.uniform(0, 24)))
+        for user in range(users)
+        for card in range(cards)
+    }
+    reviews = []
+    latencies = []
+    due_per_day = []
+
+    for day in range(days):
+        day_start = start + pd.Timedelta(days=day)
+        day_end = day_start + pd.Timedelta(days=1)
+        due = [key for key, gold_time in gold_times.items() if gold_time < day_end]
+        due_per_day.append((day_start.date(), len(due)))
+
+        for key in due:
+            reviewed_at = max(gold_times[key], day_start) + pd.Timedelta(minutes=float(rng.uniform(0, 60)))
+            feedback_value = int(rng.choice(FEEDBACK_VALUES, p=FEEDBACK_PROBS))
+
+            started = time.perf_counter()
+            gold_time = next_review_time(model, gold_times[key], feedback_value, reviewed_at)
+            latencies.append(time.perf_counter() - started)
+
+            reviews.append({
+                "user_id": key[0],
+                "card_id": key[1],
+                "reviewed_at": reviewed_at,
+                "feedback_value": feedback_value,
+            })
+            gold_times[key] = gold_time
+
+    return reviews, np.array(latencies), due_per_day
+
+
+# Phát lại log ôn tập thật (CSV: user_id, card_id, reviewed_at, feedback_value)
+def replay_reviews(model, reviews):
+    gold_times = {}
+    latencies = []
+    for review in reviews:
+        key = (review["user_id"], review["card_id"])
+        last_timestamp = gold_times.get(key, review["reviewed_at"])
+
+        started = time.perf_counter()
+        gold_times[key] = next_review_time(model, last_timestamp, review["feedback_value"], review["reviewed_at"])
+        latencies.append(time.perf_counter() - started)
+
+    due_dates = pd.Series(pd.DatetimeIndex(list(gold_times.values())).normalize()).value_counts().sort_index()
+    due_per_day = [(date.date(), int(count)) for date, count in due_dates.items()]
+    return np.array(latencies), due_per_day
+
+
+def load_recorded(path):
+    df = pd.read_csv(path, parse_dates=["reviewed_at"])
+    if "user_id" not in df.columns:
+        df["user_id"] = 0
+    df = df.sort_values("reviewed_at", kind="stable")
+    return df[["user_id", "card_id", "reviewed_at", "feedback_value"]].to_dict("records")
+
+
+def report(mode, latencies, elapsed, due_per_day, show_days):
+    latencies_ms = latencies * 1000
+    reviews_per_sec = len(latencies) / elapsed if elapsed > 0 else float("inf")
+    p50, p99 = (np.percentile(latencies_ms, [50, 99]) if len(latencies_ms) else (0.0, 0.0))
+    print(f"\n[{mode}] {len(latencies)} lượt ôn trong {elapsed:.2f}s "
+          f"→ {reviews_per_sec:,.0f} lượt/giây, p50 {p50:.3f} ms, p99 {p99:.3f} ms")
+    if show_days:
+        print("  Thẻ đến hạn mỗi ngày:")
+        for date, count in due_per_day:
+            print(f"    {date}: {count}")
+    return p99
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mô phỏng phát lại và đo hiệu năng bộ lập lịch")
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--cards", type=int, default=50)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--start", default="2024-11-01 08:00:00")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--modes", default="live,table,compact")
+    parser.add_argument("--recorded", help="CSV log ôn tập để phát lại thay cho dữ liệu tổng hợp")
+    parser.add_argument("--max-p99-ms", type=float, help="Ngưỡng p99 (ms) cho mỗi chế độ, vượt thì trả mã lỗi 1")
+    parser.add_argument("--check-table", action="store_true", help="Kiểm tra bảng tra khớp tuyệt đối get_forecast")
+    parser.add_argument("--export", help="Ghi luồng ôn tổng hợp ra CSV (định dạng của --recorded)")
+    parser.add_argument("--quiet-days", action="store_true", help="Không in số thẻ đến hạn từng ngày")
+    args = parser.parse_args()
 
-# Giả sử bạn có thời điểm gần nhất đã lật thẻ
-# Thời điểm hiện tại bạn muốn dự đoán
-last_timestamp = pd.to_datetime("2024-11-01 15:00:00")  # ví dụ thời điểm cuối cùng đã đọc thẻ
-current_timestamp = pd.to_datetime(datetime.now())
+    failed = False
+    recorded = load_recorded(args.recorded) if args.recorded else None
+    if recorded is None:
+        print(f"Mô phỏng {args.users} người × {args.cards} thẻ × {args.days} ngày")
+    else:
+        print(f"Phát lại {len(recorded)} lượt ôn từ {args.recorded}")
 
-days_difference = (current_timestamp - last_timestamp).days
+    for mode in args.modes.split(","):
+        model = load_sarimax_model(mode)
+        if model is None:
+            print(f"[{mode}] không tải được mô hình")
+            failed = True
+            continue
 
-# Giả định giá trị `point` tại thời điểm cần dự báo
-# Giá trị này có thể là -1, 0 hoặc 1 dựa trên logic bạn muốn áp dụng
-current_point = 0  # Thay đổi theo trạng thái hiện tại: -1, 0, hoặc 1
+        started = time.perf_counter()
+        if recorded is None:
+            reviews, latencies, due_per_day = simulate_reviews(
+                model, args.users, args.cards, args.days, pd.Timestamp(args.start), args.seed
+            )
+            if args.export:
+                pd.DataFrame(reviews).to_csv(args.export, index=False)
+        else:
+            latencies, due_per_day = replay_reviews(model, recorded)
+        elapsed = time.perf_counter() - started
 
-gold_point = current_point
-if current_point > -1:
-    gold_point += days_difference
+        p99 = report(mode, latencies, elapsed, due_per_day, not args.quiet_days)
+        if args.max_p99_ms is not None and p99 > args.max_p99_ms:
+            print(f"  ✗ p99 {p99:.3f} ms vượt ngưỡng {args.max_p99_ms} ms")
+            failed = True
 
-# Tạo DataFrame exog cho dự báo với giá trị `point` hiện tại
-exog_forecast = pd.DataFrame({"point": [gold_point]})
+    # Kiểm tra bảng tra (SCHEDULER_MODE=table) khớp tuyệt đối với `get_forecast`
+    if args.check_table:
+        interval_table = IntervalTable(load_sarimax_model("live"))
+        mismatches = verify_interval_table(interval_table)
+        if mismatches:
+            print(f"\nBảng tra lệch {len(mismatches)} điểm so với get_forecast, ví dụ:", mismatches[:5])
+            failed = True
+        else:
+            print(f"\nBảng tra khớp get_forecast cho {len(interval_table.points)} điểm "
+                  f"[{interval_table.min_point}, {interval_table.max_point}]")
 
-# Thực hiện dự báo khoảng cách ngày tiếp theo với mô hình đã tải
-forecast = loaded_model.get_forecast(steps=1, exog=exog_forecast)
-next_gap_days = forecast.predicted_mean.iloc[0]  # Khoảng cách ngày dự báo
+    sys.exit(1 if failed else 0)
 
-# Tính toán thời điểm lật thẻ tiếp theo
-next_reading_time = last_timestamp + timedelta(days=next_gap_days)
-print("Dự báo thời gian lật thẻ tiếp theo:", next_reading_time)
 
+if __name__ == "__main__":
+    main()
@@ -1,72 +1,287 @@
+# Huấn luyện mô hình lập lịch SARIMAX (chạy headless, không mở cửa sổ đồ thị).
+#
+#   python model/train.py                                  # mô hình chung từ dữ liệu tổng hợp
+#   python model/train.py --source csv --path reviews.csv  # mô hình riêng cho từng người học
+#   python model/train.py --source supabase --workers 8    # đọc bảng `reviews` trên Supabase
+#
+# Với dữ liệu thật, bậc sai phân d của mỗi người học được chọn bằng kiểm định ADF, rồi
+# (p, q) tốt nhất được tìm theo AIC (AIC chỉ so được giữa các mô hình cùng d). Mọi cặp
+# (người học, bậc) được fit song song trên một process pool. Bản tốt nhất được ghi vào
+# model/users/<user_id>/<version>.json (định dạng gọn, xem `export_compact_model`),
+# kèm file LATEST trỏ tới phiên bản mới nhất để `load_sarimax_model(user_id=...)` chọn.
+
+import os
+import sys
+import json
+import argparse
+import itertools
+import warnings
+import multiprocessing
+from datetime import timedelta, datetime, timezone
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
 import pandas as pd
-from datetime import timedelta
-from sklearn.metrics import mean_absolute_error
-from statsmodels.tsa.statespace.sarimax import SARIMAX
-import matplotlib.pyplot as plt
-import joblib
-
-# Số lượng mẫu cần tạo
-num_samples = 200
-
-# Tạo dữ liệu timestamp và days_since_last_read theo quy tắc
-start_date = pd.to_datetime("2023-01-01 08:00:00")
-timestamps = [start_date]
-
-# Tạo dữ liệu days_since_last_read dựa trên logic mới
-days_gaps = []
-points = []
-gap_value = 0  # Biến để theo dõi khoảng cách ôn tập hiện tại
-
-for i in range(num_samples):
-    if i < num_samples // 3:
-        # -1: Đang quên, bắt đầu với 1 giờ (1/24 ngày), tăng dần
-        gap_value = 2 / 24 + (i % 3) * (1 / 36)  # Tăng theo giờ
-        points.append(-1)
-    elif i < 2 * num_samples // 3:
-        gap_value = 1 + (i % 3)  # Tăng dần lên từ 2 ngày
-        points.append(0)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+USER_MODEL_DIR = os.path.join(ROOT, "model", "users")
+
+# Lưới bậc (p, q) cho tìm kiếm theo AIC, với d đã cố định cho từng người học
+ORDER_GRID = list(itertools.product([0, 1, 2], [0, 1, 2]))
+# Ngưỡng p-value của kiểm định ADF: nhỏ hơn thì coi chuỗi là dừng (d = 0)
+ADF_PVALUE = 0.05
+# Biến môi trường giới hạn số luồng BLAS/OpenMP của mỗi tiến trình con
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+# Người học có ít lượt ôn hơn ngưỡng này dùng mô hình chung
+MIN_REVIEWS = 30
+
+
+# Chuyển mô hình đã fit sang dạng gọn: chỉ giữ tham số và trạng thái bộ lọc Kalman cuối,
+# đủ để `CompactSarimax` (utils/schedule.py) dự báo bằng NumPy, không cần statsmodels.
+def compact_model(model_fit):
+    ssm = model_fit.model.ssm
+    filter_results = model_fit.filter_results
+    return {
+        "format": "sarimax-compact/1",
+        "order": list(model_fit.model.order),
+        "nobs": int(model_fit.nobs),
+        "aic": float(model_fit.aic),
+        "params": {name: float(value) for name, value in model_fit.params.items()},
+        "exog_names": list(model_fit.model.exog_names),
+        "exog_params": [float(model_fit.params[name]) for name in model_fit.model.exog_names],
+        "design": ssm["design"].tolist(),
+        "obs_cov": ssm["obs_cov"].tolist(),
+        "transition": ssm["transition"].tolist(),
+        "state_intercept": ssm["state_intercept"].ravel().tolist(),
+        "selection": ssm["selection"].tolist(),
+        "state_cov": ssm["state_cov"].tolist(),
+        "predicted_state": filter_results.predicted_state[:, -1].tolist(),
+        "predicted_state_cov": filter_results.predicted_state_cov[:, :, -1].tolist(),
+    }
+
+def export_compact_model(model_fit, path):
+    with open(path, "w") as f:
+        json.dump(compact_model(model_fit), f, indent=2)
+
+
+# Tạo dữ liệu tổng hợp: `days_since_last_read` tăng dần theo `point` (-1, 0, 1)
+def make_synthetic_data(num_samples=200):
+    start_date = pd.to_datetime("2023-01-01 08:00:00")
+    timestamps = [start_date]
+    days_gaps = []
+    points = []
+
+    for i in range(num_samples):
+        if i < num_samples // 3:
+            # -1: Đang quên, bắt đầu với 1 giờ (1/24 ngày), tăng dần
+            gap_value = 2 / 24 + (i % 3) * (1 / 36)  # Tăng theo giờ
+            points.append(-1)
+        elif i < 2 * num_samples // 3:
+            gap_value = 1 + (i % 3)  # Tăng dần lên từ 2 ngày
+            points.append(0)
+        else:
+            # 1: Nhớ rõ, bắt đầu với 2 ngày, tăng lên 4 ngày và tăng dần
+            gap_value = 2 * (1 + (i % 3))  # Tăng lên theo bội số 2 ngày
+            points.append(1)
+
+        days_gaps.append(gap_value)
+        timestamps.append(timestamps[-1] + timedelta(days=gap_value))
+
+    return pd.DataFrame({
+        "timestamp": timestamps[1:],  # Bỏ phần tử đầu tiên (không có khoảng cách)
+        "days_since_last_read": days_gaps,
+        "point": points
+    })
+
+
+def fit_sarimax(df, order):
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+    model = SARIMAX(df["days_since_last_read"], exog=df[["point"]], order=order)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return model.fit(disp=False)
+
+
+# Huấn luyện mô hình chung trên dữ liệu tổng hợp (hành vi gốc của script này)
+def train_global(plot_path=None):
+    import joblib
+    from sklearn.metrics import mean_absolute_error
+
+    df = make_synthetic_data()
+
+    # Huấn luyện mô hình SARIMAX với `days_since_last_read` là biến mục tiêu và `point` là đặc trưng
+    model_fit = fit_sarimax(df, (1, 1, 1))
+
+    # Dự báo trong mẫu với `exog` có cùng số lượng hàng
+    df["predicted_days_gap"] = model_fit.predict(start=1, end=len(df)-1, exog=df[["point"]][1:len(df)])
+
+    if plot_path:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+
+        plt.figure(figsize=(12, 6))
+        plt.plot(df["days_since_last_read"], label="Actual Days Gap")
+        plt.plot(df["predicted_days_gap"], label="Predicted Days Gap", linestyle="--")
+        plt.legend()
+        plt.xlabel("Sample Index")
+        plt.ylabel("Days Gap")
+        plt.title("Actual vs. Predicted Days Gap between Practice Sessions")
+        plt.savefig(plot_path)
+        print(f"Biểu đồ đã được lưu vào file '{plot_path}'")
+
+    # Tính toán lỗi MAE
+    # Bỏ qua giá trị đầu tiên vì nó không có giá trị dự báo
+    actual = df["days_since_last_read"][1:]
+    predicted = df["predicted_days_gap"][1:]
+    mae = mean_absolute_error(actual, predicted)
+    print("Mean Absolute Error (MAE):", mae)
+
+    # Lưu mô hình đã huấn luyện
+    joblib.dump(model_fit, 'model/sarimax_model.pkl')
+    print("Mô hình đã được lưu vào file 'model/sarimax_model.pkl'")
+
+    # Lưu thêm bản gọn (chỉ hệ số + trạng thái) cho SCHEDULER_MODE=compact
+    export_compact_model(model_fit, 'model/sarimax_model.json')
+    print("Mô hình gọn đã được lưu vào file 'model/sarimax_model.json'")
+
+
+# Đọc lịch sử ôn tập: user_id, card_id, reviewed_at, feedback_value
+def load_review_history(source, path=None, page_size=1000):
+    if source == "csv":
+        df = pd.read_csv(path, parse_dates=["reviewed_at"])
     else:
-        # 1: Nhớ rõ, bắt đầu với 2 ngày, tăng lên 4 ngày và tăng dần
-        gap_value = 2 * (1 + (i % 3))  # Tăng lên theo bội số 2 ngày
-        points.append(1)
-    
-    # Lưu khoảng cách vào danh sách
-    days_gaps.append(gap_value)
-    # Tạo mốc thời gian tiếp theo
-    timestamps.append(timestamps[-1] + timedelta(days=gap_value))
-
-# Tạo DataFrame với dữ liệu
-df = pd.DataFrame({
-    "timestamp": timestamps[1:],  # Bỏ phần tử đầu tiên (không có khoảng cách)
-    "days_since_last_read": days_gaps,
-    "point": points
-})
-
-# Huấn luyện mô hình SARIMAX với `days_since_last_read` là biến mục tiêu và `point` là đặc trưng
-model = SARIMAX(df["days_since_last_read"], exog=df[["point"]], order=(1, 1, 1))
-model_fit = model.fit(disp=False)
-
-# Dự báo trong mẫu với `exog` có cùng số lượng hàng
-df["predicted_days_gap"] = model_fit.predict(start=1, end=len(df)-1, exog=df[["point"]][1:len(df)])
-
-# Vẽ biểu đồ để quan sát dự báo
-plt.figure(figsize=(12, 6))
-plt.plot(df["days_since_last_read"], label="Actual Days Gap")
-plt.plot(df["predicted_days_gap"], label="Predicted Days Gap", linestyle="--")
-plt.legend()
-plt.xlabel("Sample Index")
-plt.ylabel("Days Gap")
-plt.title("Actual vs. Predicted Days Gap between Practice Sessions")
-plt.show()
-
-# Tính toán lỗi MAE
-# Bỏ qua giá trị đầu tiên vì nó không có giá trị dự báo
-actual = df["days_since_last_read"][1:]
-predicted = df["predicted_days_gap"][1:]
-mae = mean_absolute_error(actual, predicted)
-
-print("Mean Absolute Error (MAE):", mae)
-
-# Lưu mô hình đã huấn luyện
-joblib.dump(model_fit, 'model/sarimax_model.pkl')
-print("Mô hình đã được lưu vào file 'model/sarimax_model.pkl'")
+        sys.path.insert(0, ROOT)
+        from utils.registry import get_supabase
+
+        rows = []
+        start = 0
+        while True:
+            data = get_supabase().table('reviews').select('user_id, flashcard_id, reviewed_at, feedback_value') \
+                .order('reviewed_at').range(start, start + page_size - 1).execute()
+            rows.extend(data.data or [])
+            if not data.data or len(data.data) < page_size:
+                break
+            start += page_size
+        df = pd.DataFrame(rows, columns=["user_id", "flashcard_id", "reviewed_at", "feedback_value"])
+        df = df.rename(columns={"flashcard_id": "card_id"})
+        df["reviewed_at"] = pd.to_datetime(df["reviewed_at"])
+    return df
+
+
+# Dựng chuỗi huấn luyện của một người học: với mỗi thẻ, khoảng cách (ngày) giữa hai lượt
+# ôn liên tiếp là mục tiêu, phản hồi ở lượt trước là `point`; sắp theo thời gian.
+def build_user_series(reviews):
+    reviews = reviews.sort_values(["card_id", "reviewed_at"], kind="stable")
+    previous = reviews.groupby("card_id").shift(1)
+    series = pd.DataFrame({
+        "timestamp": reviews["reviewed_at"],
+        "days_since_last_read": (reviews["reviewed_at"] - previous["reviewed_at"]).dt.total_seconds() / 86400,
+        "point": previous["feedback_value"],
+    }).dropna()
+    return series.sort_values("timestamp", kind="stable").reset_index(drop=True)
+
+
+def _fit_candidate(user_id, order, series):
+    try:
+        model_fit = fit_sarimax(series, order)
+        return user_id, order, compact_model(model_fit), None
+    except Exception as e:
+        return user_id, order, None, str(e)
+
+# Mỗi tiến trình chỉ dùng 1 luồng BLAS để không tranh CPU với nhau. Biến môi trường chỉ
+# có tác dụng trước khi NumPy được import (tiến trình con khởi động bằng spawn), nên
+# thư viện BLAS đã nạp được giới hạn thêm bằng threadpoolctl.
+def _limit_threads():
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = "1"
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return
+    threadpool_limits(limits=1)
+
+
+# Chọn bậc sai phân d cho chuỗi khoảng cách ôn: 0 nếu kiểm định ADF bác bỏ giả thuyết
+# có nghiệm đơn vị, ngược lại 1. Chuỗi không kiểm định được (ví dụ hằng số) giữ d = 1
+# như mô hình chung.
+def choose_differencing(series, pvalue=ADF_PVALUE):
+    from statsmodels.tsa.stattools import adfuller
+
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            return 0 if adfuller(series["days_since_last_read"], autolag="AIC")[1] < pvalue else 1
+    except Exception:
+        return 1
+
+
+def write_user_artifact(user_id, compact, version):
+    user_dir = os.path.join(USER_MODEL_DIR, str(user_id))
+    os.makedirs(user_dir, exist_ok=True)
+    with open(os.path.join(user_dir, f"{version}.json"), "w") as f:
+        json.dump(compact, f, indent=2)
+    with open(os.path.join(user_dir, "LATEST"), "w") as f:
+        f.write(version)
+
+
+# Fit song song mọi cặp (người học, bậc), giữ bậc có AIC nhỏ nhất cho từng người
+# (mọi ứng viên của một người học dùng chung một d nên AIC so sánh được)
+def train_per_user(reviews, workers=None, orders=ORDER_GRID, min_reviews=MIN_REVIEWS):
+    version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    series_by_user = {
+        user_id: build_user_series(user_reviews)
+        for user_id, user_reviews in reviews.groupby("user_id")
+    }
+    series_by_user = {user_id: series for user_id, series in series_by_user.items() if len(series) >= min_reviews}
+    print(f"{len(series_by_user)} người học đủ {min_reviews} lượt ôn, {len(orders)} bậc mỗi người")
+
+    differencing = {user_id: choose_differencing(series) for user_id, series in series_by_user.items()}
+
+    # Đặt biến môi trường trước khi tạo pool để tiến trình con (spawn) thấy ngay khi import
+    # NumPy; BLAS của tiến trình cha đã nạp nên không bị ảnh hưởng
+    os.environ.update({var: "1" for var in THREAD_ENV_VARS})
+    best = {}
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_limit_threads) as pool:
+        futures = [
+            pool.submit(_fit_candidate, user_id, (p, differencing[user_id], q), series)
+            for user_id, series in series_by_user.items()
+            for p, q in orders
+        ]
+        for future in as_completed(futures):
+            user_id, order, compact, error = future.result()
+            if compact is None or not np.isfinite(compact["aic"]):
+                continue
+            if user_id not in best or compact["aic"] < best[user_id]["aic"]:
+                best[user_id] = compact
+
+    for user_id, compact in best.items():
+        write_user_artifact(user_id, compact, version)
+        print(f"  {user_id}: order={tuple(compact['order'])} aic={compact['aic']:.2f}")
+    print(f"Đã ghi {len(best)} mô hình phiên bản {version} vào '{USER_MODEL_DIR}'")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Huấn luyện mô hình lập lịch SARIMAX")
+    parser.add_argument("--source", choices=["synthetic", "csv", "supabase"], default="synthetic")
+    parser.add_argument("--path", help="File CSV lịch sử ôn tập khi --source csv")
+    parser.add_argument("--workers", type=int, default=None, help="Số tiến trình (mặc định: số lõi CPU)")
+    parser.add_argument("--min-reviews", type=int, default=MIN_REVIEWS)
+    parser.add_argument("--plot", help="Lưu biểu đồ dự báo (chỉ với --source synthetic)")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    if args.source == "synthetic":
+        train_global(args.plot)
+        return
+
+    if args.source == "csv" and not args.path:
+        parser.error("--source csv cần --path")
+    reviews = load_review_history(args.source, args.path)
+    train_per_user(reviews, workers=args.workers, min_reviews=args.min_reviews)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+-- Thống kê cho trang Thống kê, tính trên Postgres để chỉ trả về một dòng mỗi nhóm
+-- (gọi qua supabase.rpc trong utils/storage.py). Chạy bằng `supabase db push` hoặc
+-- dán vào SQL editor của project.
+
+create index if not exists flashcards_user_id_gold_time on flashcards (user_id, gold_time);
+create index if not exists notes_user_id_flashcard_id on notes (user_id, flashcard_id);
+
+-- Số ghi chú theo thẻ của một người học
+create or replace function note_counts_by_flashcard(p_user_id bigint)
+returns table (flashcard_id bigint, note_count bigint)
+language sql stable
+as $$
+    select flashcard_id, count(*)
+    from notes
+    where user_id = p_user_id
+    group by flashcard_id;
+$$;
+
+-- Số thẻ theo mức đến hạn so với p_now (cùng ngưỡng với get_priority_icon)
+create or replace function flashcard_status_counts(p_user_id bigint, p_now timestamp)
+returns table (overdue bigint, due_1d bigint, due_2d bigint, later bigint)
+language sql stable
+as $$
+    select
+        count(*) filter (where gold_time < p_now),
+        count(*) filter (where gold_time >= p_now and gold_time <= p_now + interval '1 day'),
+        count(*) filter (where gold_time > p_now + interval '1 day' and gold_time <= p_now + interval '2 days'),
+        count(*) filter (where gold_time is null or gold_time > p_now + interval '2 days')
+    from flashcards
+    where user_id = p_user_id;
+$$;
@@ -0,0 +1,27 @@
+-- Cộng dồn study_progress nguyên tử, nhiều ngày trong một lần gọi (supabase.rpc trong
+-- utils/storage.py), thay cho select rồi update/insert vốn làm mất lượt ôn khi hai lần
+-- đồng bộ chạy đồng thời.
+--
+-- ON CONFLICT cần ràng buộc duy nhất trên (user_id, date). Nếu bảng đã có hàng trùng
+-- ngày của cùng người học, cần gộp chúng trước khi chạy migration này.
+
+create unique index if not exists study_progress_user_id_date on study_progress (user_id, date);
+
+-- p_days: [{"date": "2024-11-01", "good_count": 1, "normal_count": 0, "bad_count": 2}, ...]
+create or replace function increment_study_progress(p_user_id bigint, p_days jsonb)
+returns void
+language sql
+as $$
+    insert into study_progress (user_id, date, good_count, normal_count, bad_count)
+    select
+        p_user_id,
+        (day ->> 'date')::date,
+        coalesce((day ->> 'good_count')::int, 0),
+        coalesce((day ->> 'normal_count')::int, 0),
+        coalesce((day ->> 'bad_count')::int, 0)
+    from jsonb_array_elements(p_days) as day
+    on conflict (user_id, date) do update set
+        good_count = study_progress.good_count + excluded.good_count,
+        normal_count = study_progress.normal_count + excluded.normal_count,
+        bad_count = study_progress.bad_count + excluded.bad_count;
+$$;
@@ -0,0 +1,17 @@
+-- Ghi gold_time cho nhiều thẻ trong một lần gọi (supabase.rpc trong utils/storage.py).
+-- Chỉ UPDATE cột gold_time của thẻ đang tồn tại: thẻ đã bị xóa ở phiên khác không bị
+-- tạo lại, và word/meaning/example đang được sửa đồng thời không bị ghi đè.
+-- Trả về id các thẻ đã cập nhật.
+
+-- p_gold_times: [{"id": 12, "gold_time": "2024-11-01 08:00:00"}, ...]
+create or replace function set_flashcard_gold_times(p_user_id bigint, p_gold_times jsonb)
+returns table (id bigint)
+language sql
+as $$
+    update flashcards as card
+    set gold_time = (item ->> 'gold_time')::timestamp
+    from jsonb_array_elements(p_gold_times) as item
+    where card.id = (item ->> 'id')::bigint
+      and card.user_id = p_user_id
+    returning card.id;
+$$;
@@ -0,0 +1,44 @@
+-- Cộng dồn study_progress theo từng lượt ôn có id duy nhất (supabase.rpc trong
+-- utils/storage.py, dùng bởi luồng ghi nền utils/writebehind.py). Id của lượt ôn đã
+-- cộng được ghi vào study_progress_events trong cùng giao dịch, nên gửi lại một lô
+-- (sau lỗi mạng, hoặc tiến trình chết giữa lúc đẩy và lúc xóa log) không đếm trùng.
+
+create table if not exists study_progress_events (
+    event_id text primary key,
+    user_id bigint not null,
+    applied_at timestamptz not null default now()
+);
+
+-- p_events: [{"event_id": "…", "date": "2024-11-01", "feedback_value": 1}, ...]
+create or replace function record_study_events(p_user_id bigint, p_events jsonb)
+returns void
+language sql
+as $$
+    with events as (
+        select distinct on (event ->> 'event_id')
+            event ->> 'event_id' as event_id,
+            (event ->> 'date')::date as date,
+            (event ->> 'feedback_value')::int as feedback_value
+        from jsonb_array_elements(p_events) as event
+    ),
+    fresh as (
+        insert into study_progress_events (event_id, user_id)
+        select event_id, p_user_id from events
+        on conflict (event_id) do nothing
+        returning event_id
+    )
+    insert into study_progress (user_id, date, good_count, normal_count, bad_count)
+    select
+        p_user_id,
+        events.date,
+        count(*) filter (where events.feedback_value = 1),
+        count(*) filter (where events.feedback_value = 0),
+        count(*) filter (where events.feedback_value = -1)
+    from events
+    join fresh using (event_id)
+    group by events.date
+    on conflict (user_id, date) do update set
+        good_count = study_progress.good_count + excluded.good_count,
+        normal_count = study_progress.normal_count + excluded.normal_count,
+        bad_count = study_progress.bad_count + excluded.bad_count;
+$$;
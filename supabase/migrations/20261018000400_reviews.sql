@@ -0,0 +1,58 @@
+-- Lịch sử ôn tập: một hàng mỗi lượt ôn, nguồn dữ liệu của `model/train.py --source
+-- supabase`. Luồng ghi nền (utils/writebehind.py) ghi vào đây qua record_study_events,
+-- cùng giao dịch với study_progress; event_id duy nhất nên gửi lại một lô không ghi trùng.
+
+create table if not exists reviews (
+    id bigint generated by default as identity primary key,
+    user_id bigint not null,
+    flashcard_id bigint not null,
+    reviewed_at timestamp not null,
+    feedback_value smallint not null,
+    event_id text not null unique
+);
+
+create index if not exists reviews_user_id_reviewed_at on reviews (user_id, reviewed_at);
+
+-- p_events: [{"event_id": "…", "card_id": 12, "reviewed_at": "2024-11-01 08:00:00",
+--             "date": "2024-11-01", "feedback_value": 1}, ...]
+create or replace function record_study_events(p_user_id bigint, p_events jsonb)
+returns void
+language sql
+as $$
+    with events as (
+        select distinct on (event ->> 'event_id')
+            event ->> 'event_id' as event_id,
+            (event ->> 'card_id')::bigint as card_id,
+            (event ->> 'reviewed_at')::timestamp as reviewed_at,
+            (event ->> 'date')::date as date,
+            (event ->> 'feedback_value')::int as feedback_value
+        from jsonb_array_elements(p_events) as event
+    ),
+    fresh as (
+        insert into study_progress_events (event_id, user_id)
+        select event_id, p_user_id from events
+        on conflict (event_id) do nothing
+        returning event_id
+    ),
+    recorded as (
+        insert into reviews (user_id, flashcard_id, reviewed_at, feedback_value, event_id)
+        select p_user_id, events.card_id, events.reviewed_at, events.feedback_value, events.event_id
+        from events
+        join fresh using (event_id)
+        on conflict (event_id) do nothing
+    )
+    insert into study_progress (user_id, date, good_count, normal_count, bad_count)
+    select
+        p_user_id,
+        events.date,
+        count(*) filter (where events.feedback_value = 1),
+        count(*) filter (where events.feedback_value = 0),
+        count(*) filter (where events.feedback_value = -1)
+    from events
+    join fresh using (event_id)
+    group by events.date
+    on conflict (user_id, date) do update set
+        good_count = study_progress.good_count + excluded.good_count,
+        normal_count = study_progress.normal_count + excluded.normal_count,
+        bad_count = study_progress.bad_count + excluded.bad_count;
+$$;
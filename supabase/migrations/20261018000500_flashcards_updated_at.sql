@@ -0,0 +1,24 @@
+-- Cột updated_at cho đồng bộ delta bộ thẻ (list_flashcards(updated_after=...) trong
+-- utils/storage.py, con trỏ `cursor` trong utils/database.py).
+-- Thẻ cũ nhận mốc lúc chạy migration; mọi INSERT/UPDATE sau đó (kể cả
+-- set_flashcard_gold_times) được trigger đóng dấu lại thời điểm hiện tại.
+
+alter table flashcards
+    add column if not exists updated_at timestamptz not null default now();
+
+create index if not exists flashcards_user_id_updated_at on flashcards (user_id, updated_at);
+
+create or replace function touch_flashcard_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at := now();
+    return new;
+end;
+$$;
+
+drop trigger if exists flashcards_touch_updated_at on flashcards;
+create trigger flashcards_touch_updated_at
+before update on flashcards
+for each row execute function touch_flashcard_updated_at();
@@ -0,0 +1,46 @@
+from types import SimpleNamespace
+
+import pytest
+
+from utils import database
+from utils.storage import SQLiteBackend
+
+
+class SessionState(dict):
+
+    __getattr__ = dict.__getitem__
+    __setattr__ = dict.__setitem__
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    backend = SQLiteBackend(str(tmp_path / "anki.sqlite3"))
+    user_id = backend.create_user("a", "secret")["id"]
+    errors = []
+    monkeypatch.setattr(database, "st", SimpleNamespace(session_state=SessionState(user_id=user_id), error=errors.append))
+    monkeypatch.setattr(database, "get_storage", lambda: backend)
+    backend.errors = errors
+    backend.user_id = user_id
+    return backend
+
+
+def card(word):
+    return {"word": word, "meaning": "m", "example": ""}
+
+
+def test_bulk_add_skips_words_already_in_deck(backend):
+    backend.add_flashcards(backend.user_id, [card("食べる")])
+    added, skipped = database.bulk_add_flashcards([card(" 食べる "), card("ＡＢＣ"), card("abc"), card("飲む")])
+    assert [row["word"] for row in added] == ["ＡＢＣ", "飲む"]
+    assert [row["word"] for row in skipped] == [" 食べる ", "abc"]
+    assert sorted(row["word"] for row in backend.list_flashcards(backend.user_id)) == sorted(["食べる", "ＡＢＣ", "飲む"])
+    assert backend.errors == []
+
+
+def test_bulk_add_sees_cards_added_earlier_in_session(backend):
+    database.get_cached_flashcards()
+    database.bulk_add_flashcards([card("飲む")])
+    added, skipped = database.bulk_add_flashcards([card("飲む"), card("")])
+    assert added == []
+    assert [row["word"] for row in skipped] == ["飲む", ""]
+    assert len(backend.list_flashcards(backend.user_id)) == 1
@@ -0,0 +1,55 @@
+import json
+import random
+
+from utils.jsonstream import JsonArrayStream
+
+ITEMS = [
+    {"word": "食べる", "meaning": "ăn", "example": "ご飯を食べる。"},
+    {"word": "言う", "meaning": "nói", "example": "彼は \"はい\" と言った [sic]。"},
+    {"word": "x", "meaning": "{y}", "example": ""},
+]
+TEXT = "```json\n" + json.dumps(ITEMS, ensure_ascii=False, indent=2) + "\n```"
+
+
+def feed_in_pieces(text, sizes):
+    stream = JsonArrayStream()
+    items = []
+    position = 0
+    for size in sizes:
+        items.extend(stream.feed(text[position:position + size]))
+        position += size
+    items.extend(stream.feed(text[position:]))
+    return stream, items
+
+
+def test_any_chunking_gives_same_items():
+    rng = random.Random(0)
+    for _ in range(50):
+        stream, items = feed_in_pieces(TEXT, [rng.randint(1, 7) for _ in range(len(TEXT))])
+        assert items == ITEMS
+        assert stream.complete
+        assert not stream.errors
+
+
+def test_items_arrive_as_soon_as_they_close():
+    text = json.dumps(ITEMS, ensure_ascii=False)
+    first_end = text.index("}") + 1
+    stream = JsonArrayStream()
+    assert stream.feed(text[:first_end - 1]) == []
+    assert stream.feed(text[first_end - 1:first_end]) == [ITEMS[0]]
+
+
+def test_truncated_response_keeps_closed_items():
+    text = json.dumps(ITEMS, ensure_ascii=False)
+    cut = text.index('"meaning": "nói"')
+    stream = JsonArrayStream()
+    assert stream.feed(text[:cut]) == [ITEMS[0]]
+    assert not stream.complete
+
+
+def test_malformed_item_only_loses_itself():
+    stream = JsonArrayStream()
+    items = stream.feed('[{"word": "a"}, {"word": b}, 3, "x"]')
+    assert items == [{"word": "a"}, 3, "x"]
+    assert len(stream.errors) == 1
+    assert stream.complete
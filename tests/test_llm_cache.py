@@ -0,0 +1,56 @@
+import pytest
+
+from utils import llm_cache
+from utils.llm_cache import ResponseCache, response_cache_key
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm_cache.time, "time", clock)
+    return clock
+
+
+def test_key_depends_on_model_config_and_prompt():
+    key = response_cache_key("flash", {"temperature": 1}, "prompt")
+    assert key == response_cache_key("flash", {"temperature": 1}, "prompt")
+    assert key != response_cache_key("pro", {"temperature": 1}, "prompt")
+    assert key != response_cache_key("flash", {"temperature": 0}, "prompt")
+    assert key != response_cache_key("flash", {"temperature": 1}, "other")
+
+
+def test_expired_entry_is_dropped(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), ttl=60, max_entries=10)
+    cache.put("k", "flash", "answer")
+    clock.now += 60
+    assert cache.get("k") == "answer"
+    clock.now += 1
+    assert cache.get("k") is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), ttl=3600, max_entries=2)
+    cache.put("a", "flash", "1")
+    clock.now += 1
+    cache.put("b", "flash", "2")
+    clock.now += 1
+    assert cache.get("a") == "1"
+    clock.now += 1
+    cache.put("c", "flash", "3")
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == ("1", None, "3")
+
+
+def test_entries_survive_reopening(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite3")
+    ResponseCache(path).put("k", "flash", "answer")
+    assert ResponseCache(path).get("k") == "answer"
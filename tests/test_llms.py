@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+pytest.importorskip("google.generativeai")
+
+from utils.llms import GeminiFlash, chunk_text, estimate_tokens, split_sentences
+
+
+def test_chunks_respect_token_limit_and_keep_text():
+    text = "。".join(f"文{index}はとても長い例文です" for index in range(60)) + "。"
+    chunks = chunk_text(text, max_tokens=40)
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 40 for chunk in chunks)
+    assert "".join(chunks).replace(" ", "") == text
+
+
+def test_sentence_longer_than_limit_is_cut():
+    chunks = chunk_text("あ" * 100, max_tokens=30)
+    assert all(estimate_tokens(chunk) <= 30 for chunk in chunks)
+    assert "".join(chunks) == "あ" * 100
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    monkeypatch.setenv("LLM_CACHE", "0")
+    llm = GeminiFlash()
+    llm.extraction_prompt = lambda chunk, level: chunk
+    return llm
+
+
+# Phản hồi bị cắt cụt khi đoạn có nhiều câu, đầy đủ khi chỉ còn một câu
+def fake_stream(prompt, generation_config, api_key=None):
+    sentences = split_sentences(prompt)
+    items = json.dumps([{"word": sentence, "meaning": "m", "example": ""} for sentence in sentences], ensure_ascii=False)
+    if len(sentences) > 1:
+        yield items[:len(items) // 2]
+    else:
+        yield items
+
+
+def test_truncated_chunk_is_split_and_retried(llm):
+    llm.generate_stream = fake_stream
+    emitted = []
+    invalid = llm.extract_chunk("一。二。三。", "N5", emitted.append)
+    assert invalid == 0
+    assert {item["word"] for item in emitted} == {"一。", "二。", "三。"}
+
+
+def test_single_truncated_sentence_raises(llm):
+    llm.generate_stream = lambda prompt, config, api_key=None: iter(['[{"word": "一"'])
+    with pytest.raises(ValueError):
+        llm.extract_chunk("一。", "N5", lambda item: None)
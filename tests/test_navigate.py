@@ -0,0 +1,51 @@
+import pandas as pd
+
+from utils.database import sort_flashcards
+from utils.navigate import DueQueue
+
+NOW = pd.Timestamp("2024-11-01 08:00:00")
+
+
+def make_cards(hours):
+    return [
+        {"id": card_id, "gold_time": NOW + pd.Timedelta(hours=offset) if offset is not None else pd.NaT}
+        for card_id, offset in enumerate(hours)
+    ]
+
+
+def test_queue_order_matches_sort_flashcards():
+    cards = make_cards([30, -50, None, -2, 5, -49, 200, -100])
+    queue = DueQueue(list(cards), now=NOW)
+    expected = [card["id"] for card in sort_flashcards(list(cards), now=NOW)]
+    assert [card["id"] for card in queue.upcoming(len(cards))] == expected
+
+
+def test_reschedule_moves_card_and_pop_follows_order():
+    cards = make_cards([-10, 1, 2])
+    queue = DueQueue(cards, now=NOW)
+    assert queue.peek()["id"] == 0
+
+    queue.reschedule(0, NOW + pd.Timedelta(hours=5))
+    assert queue.peek()["id"] == 1
+    assert [card["id"] for card in queue.upcoming(3)] == [1, 2, 0]
+    assert len(queue) == 3
+
+    assert [queue.pop()["id"] for _ in range(3)] == [1, 2, 0]
+    assert len(queue) == 0
+    assert queue.peek() is None
+
+
+def test_upcoming_does_not_consume_queue():
+    queue = DueQueue(make_cards([3, 1, 2]), now=NOW)
+    assert [card["id"] for card in queue.upcoming(2)] == [1, 2]
+    assert [card["id"] for card in queue.upcoming(5)] == [1, 2, 0]
+    assert queue.pop()["id"] == 1
+
+
+def test_upcoming_skips_rescheduled_entries():
+    queue = DueQueue(make_cards(list(range(20))), now=NOW)
+    for card_id in range(0, 20, 2):
+        queue.reschedule(card_id, NOW + pd.Timedelta(hours=100 + card_id))
+    expected = list(range(1, 20, 2)) + list(range(0, 20, 2))
+    assert [card["id"] for card in queue.upcoming(20)] == expected
+    assert [card["id"] for card in queue.upcoming(3)] == [1, 3, 5]
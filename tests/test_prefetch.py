@@ -0,0 +1,56 @@
+import threading
+
+from utils.prefetch import NotePrefetcher
+
+CARDS = [{"word": f"w{index}", "meaning": "m", "example": ""} for index in range(4)]
+
+
+class FakeLLM:
+    generation_config = {}
+
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+
+    def note_prompt(self, card, request):
+        return f"{card['word']}:{request}"
+
+    def generate(self, prompt, generation_config, api_key=None):
+        self.calls.append(prompt)
+        self.release.wait(5)
+        return f"note {prompt}"
+
+
+def test_taken_note_is_not_generated_again():
+    llm = FakeLLM()
+    llm.release.set()
+    prefetcher = NotePrefetcher(workers=2, daily_budget=10)
+
+    assert prefetcher.schedule("u", CARDS[:2], llm, "key", "R") == 2
+    assert prefetcher.take(CARDS[0], "R", timeout=5) == "note w0:R"
+    # Lần vẽ lại tiếp theo lên lịch lại cùng các thẻ
+    assert prefetcher.schedule("u", CARDS[:2], llm, "key", "R") == 0
+    assert prefetcher.take(CARDS[0], "R") == "note w0:R"
+    assert prefetcher.take(CARDS[1], "R", timeout=5) == "note w1:R"
+    assert sorted(llm.calls) == ["w0:R", "w1:R"]
+    assert prefetcher.remaining("u") == 8
+
+
+def test_budget_limits_generations_per_user():
+    llm = FakeLLM()
+    llm.release.set()
+    prefetcher = NotePrefetcher(workers=2, daily_budget=3)
+
+    assert prefetcher.schedule("u", CARDS, llm, "key", "R") == 3
+    assert prefetcher.schedule("v", CARDS, llm, "key", "S") == 3
+    assert prefetcher.remaining("u") == 0
+
+
+def test_pending_note_is_not_returned_without_waiting():
+    llm = FakeLLM()
+    prefetcher = NotePrefetcher(workers=1, daily_budget=10)
+    prefetcher.schedule("u", CARDS[:1], llm, "key", "R")
+
+    assert prefetcher.take(CARDS[0], "R") is None
+    llm.release.set()
+    assert prefetcher.take(CARDS[0], "R", timeout=5) == "note w0:R"
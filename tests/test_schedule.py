@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from utils.schedule import MIN_REVIEW_DELAY, load_sarimax_model, next_review_times, predict_next_gold_times
+
+NOW = pd.Timestamp("2024-11-01 08:00:00")
+
+
+class FixedGapModel:
+
+    def __init__(self, gap_days):
+        self.gap_days = gap_days
+
+    def predict_gaps(self, gold_points):
+        return np.full(len(gold_points), self.gap_days)
+
+
+def test_overdue_card_answered_bad_is_no_longer_overdue():
+    overdue = NOW - pd.Timedelta(days=10)
+    next_time = next_review_times(FixedGapModel(-3.8), [overdue], [-1], [NOW])[0]
+    assert next_time == NOW + MIN_REVIEW_DELAY
+
+
+def test_overdue_lateness_is_not_counted_twice():
+    # Số ngày trễ đã nằm trong gold_point nên khoảng cách vẫn tính từ gold_time cũ
+    overdue = NOW - pd.Timedelta(days=10)
+    next_time = next_review_times(FixedGapModel(12), [overdue], [1], [NOW])[0]
+    assert next_time == overdue + pd.Timedelta(days=12)
+
+
+def test_same_as_model_prediction_when_not_clamped():
+    model = load_sarimax_model("compact")
+    last_timestamps = [NOW - pd.Timedelta(days=days) for days in (3, 30)]
+    expected = predict_next_gold_times(model, last_timestamps, [1, 1], now=[NOW, NOW])
+    assert list(next_review_times(model, last_timestamps, [1, 1], [NOW, NOW])) == list(expected)
+
+
+def test_gap_is_anchored_at_gold_time_for_early_reviews():
+    early = NOW + pd.Timedelta(days=1)
+    next_time = next_review_times(FixedGapModel(2), [early], [1], [NOW])[0]
+    assert next_time == early + pd.Timedelta(days=2)
@@ -0,0 +1,105 @@
+import threading
+
+import pytest
+
+from utils.storage import SQLiteBackend, StorageBackend
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return SQLiteBackend(str(tmp_path / "anki.sqlite3"))
+
+
+@pytest.fixture
+def user_id(backend):
+    return backend.create_user("a", "secret")["id"]
+
+
+def test_set_gold_times_only_updates_existing_cards(backend, user_id):
+    kept, deleted = [row["id"] for row in backend.add_flashcards(user_id, [
+        {"word": "a", "meaning": "m", "example": ""},
+        {"word": "b", "meaning": "m", "example": ""},
+    ])]
+    backend.delete_flashcards(user_id, [deleted])
+    backend.update_flashcard(user_id, kept, {"meaning": "edited"})
+
+    updated = backend.set_gold_times(user_id, {kept: "2030-01-01 00:00:00", deleted: "2030-01-01 00:00:00"})
+
+    assert updated == {kept}
+    cards = backend.list_flashcards(user_id)
+    assert [(card["id"], card["meaning"], card["gold_time"]) for card in cards] == [(kept, "edited", "2030-01-01 00:00:00")]
+
+
+def test_set_gold_times_ignores_other_users_cards(backend, user_id):
+    other = backend.create_user("b", "secret")["id"]
+    card_id = backend.add_flashcards(other, [{"word": "a", "meaning": "m", "example": ""}])[0]["id"]
+    assert backend.set_gold_times(user_id, {card_id: "2030-01-01 00:00:00"}) == set()
+
+
+def test_flashcards_page_orders_by_gold_time(backend, user_id):
+    backend.add_flashcards(user_id, [
+        {"word": "late", "meaning": "m", "example": "", "gold_time": "2030-01-02 00:00:00"},
+        {"word": "none", "meaning": "m", "example": ""},
+        {"word": "early", "meaning": "m", "example": "", "gold_time": "2030-01-01 00:00:00"},
+    ])
+    rows, total = backend.list_flashcards_page(user_id, 0, 2)
+    assert total == 3
+    assert [row["word"] for row in rows] == ["early", "late"]
+    rows, _ = backend.list_flashcards_page(user_id, 2, 2)
+    assert [row["word"] for row in rows] == ["none"]
+
+
+def test_record_study_events_skips_seen_ids(backend, user_id):
+    events = [
+        {"event_id": "e1", "card_id": 7, "reviewed_at": "2024-11-01 08:00:00", "date": "2024-11-01", "feedback_value": 1},
+        {"event_id": "e2", "card_id": 7, "reviewed_at": "2024-11-01 09:00:00", "date": "2024-11-01", "feedback_value": 0},
+        {"event_id": "e3", "card_id": 8, "reviewed_at": "2024-11-02 08:00:00", "date": "2024-11-02", "feedback_value": -1},
+    ]
+    backend.record_study_events(user_id, events[:2])
+    backend.record_study_events(user_id, events)
+    progress = [
+        (row["date"], row["good_count"], row["normal_count"], row["bad_count"])
+        for row in backend.list_study_progress(user_id)
+    ]
+    assert progress == [("2024-11-01", 1, 1, 0), ("2024-11-02", 0, 0, 1)]
+    reviews = backend._query("SELECT flashcard_id, reviewed_at, feedback_value FROM reviews ORDER BY reviewed_at")
+    assert [tuple(row.values()) for row in reviews] == [
+        (7, "2024-11-01 08:00:00", 1),
+        (7, "2024-11-01 09:00:00", 0),
+        (8, "2024-11-02 08:00:00", -1),
+    ]
+
+
+def test_incomplete_backend_fails_on_creation():
+    class PartialBackend(StorageBackend):
+        def authenticate(self, username, password):
+            return None
+
+    with pytest.raises(TypeError):
+        PartialBackend()
+
+
+def test_increment_study_progress_adds_to_several_days(backend, user_id):
+    backend.increment_study_progress(user_id, {
+        "2024-11-01": {"good_count": 1, "normal_count": 2, "bad_count": 0},
+        "2024-11-02": {"good_count": 0, "normal_count": 0, "bad_count": 3},
+    })
+    backend.increment_study_progress(user_id, {"2024-11-02": {"good_count": 4, "normal_count": 0, "bad_count": 1}})
+    progress = [
+        (row["date"], row["good_count"], row["normal_count"], row["bad_count"])
+        for row in backend.list_study_progress(user_id)
+    ]
+    assert progress == [("2024-11-01", 1, 2, 0), ("2024-11-02", 4, 0, 4)]
+
+
+def test_concurrent_increments_are_not_lost(backend, user_id):
+    def increment():
+        for _ in range(50):
+            backend.increment_study_progress(user_id, {"2024-11-01": {"good_count": 1, "normal_count": 0, "bad_count": 0}})
+
+    threads = [threading.Thread(target=increment) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert backend.list_study_progress(user_id)[0]["good_count"] == 200
@@ -0,0 +1,91 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import utils.database as database
+from utils.storage import SQLiteBackend
+from utils.writebehind import FeedbackLog, WriteBehindWriter, flush_user_events
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    backend = SQLiteBackend(str(tmp_path / "anki.sqlite3"))
+    monkeypatch.setattr(database, "get_storage", lambda: backend)
+    return backend
+
+
+def add_user_with_card(backend, username):
+    user_id = backend.create_user(username, "secret")["id"]
+    card_id = backend.add_flashcards(user_id, [{"word": username, "meaning": "m", "example": ""}])[0]["id"]
+    return user_id, card_id
+
+
+def good_counts(backend, user_id):
+    return [row["good_count"] for row in backend.list_study_progress(user_id)]
+
+
+def test_failed_user_does_not_recount_other_users(backend, tmp_path):
+    user_a, card_a = add_user_with_card(backend, "a")
+    user_b, card_b = add_user_with_card(backend, "b")
+    log = FeedbackLog(str(tmp_path / "feedback.sqlite3"))
+
+    failures = []
+    def flaky_flush(user_id, events):
+        if user_id == user_b and not failures:
+            failures.append(user_id)
+            raise RuntimeError("network down")
+        flush_user_events(user_id, events)
+
+    writer = WriteBehindWriter(log, flush=flaky_flush, interval=3600)
+    now = pd.Timestamp("2024-11-01 08:00:00")
+    log.append(user_a, card_a, now, now, 1)
+    log.append(user_b, card_b, now, now, 1)
+
+    writer._drain()
+    assert good_counts(backend, user_a) == [1]
+    assert good_counts(backend, user_b) == []
+    assert log.count() == 1
+    assert writer.failures == 1
+
+    writer._drain()
+    assert good_counts(backend, user_a) == [1]
+    assert good_counts(backend, user_b) == [1]
+    assert log.count() == 0
+    assert writer.failures == 0
+
+
+def test_resending_events_is_idempotent(backend, tmp_path):
+    user_id, card_id = add_user_with_card(backend, "a")
+    log = FeedbackLog(str(tmp_path / "feedback.sqlite3"))
+    now = pd.Timestamp("2024-11-01 08:00:00")
+    log.append(user_id, card_id, now + pd.Timedelta(days=2), now, 1)
+    log.append(user_id, card_id, now + pd.Timedelta(days=3), now, -1)
+    events = log.pending()
+
+    # Tiến trình chết giữa lúc đẩy và lúc xóa log: cả lô được gửi lại
+    flush_user_events(user_id, events)
+    flush_user_events(user_id, events)
+
+    progress = backend.list_study_progress(user_id)
+    assert [(row["good_count"], row["bad_count"]) for row in progress] == [(1, 1)]
+    assert backend.list_flashcards(user_id)[0]["gold_time"] == "2024-11-04 08:00:00"
+
+
+def test_old_log_gets_event_ids(tmp_path):
+    path = str(tmp_path / "feedback.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE feedback_events (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL,"
+        " card_id TEXT NOT NULL, gold_time TEXT NOT NULL, reviewed_at TEXT NOT NULL, feedback_value INTEGER NOT NULL)"
+    )
+    conn.execute(
+        "INSERT INTO feedback_events (user_id, card_id, gold_time, reviewed_at, feedback_value)"
+        " VALUES ('1', '2', '2024-11-02T08:00:00', '2024-11-01T08:00:00', 0)"
+    )
+    conn.commit()
+    conn.close()
+
+    events = FeedbackLog(path).pending()
+    assert len(events) == 1
+    assert events[0]["event_id"]
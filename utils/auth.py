@@ -1,10 +1,9 @@
 import streamlit as st
-from utils.database import supabase
+from utils.registry import get_storage
 
 def authenticate(username, password):
-    response = supabase.table('users').select('*').eq('username', username).eq('password', password).execute()
-    if response.data:
-        user = response.data[0]
+    user = get_storage().authenticate(username, password)
+    if user:
         return user['id'], user['is_admin']
     else:
         return None, False
@@ -18,6 +17,11 @@ def logout_and_clear_state():
     st.session_state.extracted_flashcards = []
     st.session_state.flashcard_edit_mode = {}
     st.session_state.feedback_list = []
+    st.session_state.pop('flashcards_cache', None)
+    st.session_state.pop('flashcards_page_cache', None)
+    st.session_state.collection_page = 0
+    st.session_state.pop('notes_cache', None)
+    st.session_state.pop('study_progress_cache', None)
 
 def check_login_status():
     if 'user_id' not in st.session_state:
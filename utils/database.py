@@ -1,104 +1,353 @@
 # utils/database.py
 
 import os
+import unicodedata
+import numpy as np
 import pandas as pd
-from datetime import datetime
-from supabase import create_client
+from datetime import datetime, date
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import streamlit as st
+from utils.registry import get_storage
 
 # Load environment variables from .env file
 load_dotenv()
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
-# Initialize Supabase client
-@st.cache_resource
-def init_supabase():
-    if not SUPABASE_URL or not SUPABASE_KEY:
-        raise ValueError("Supabase URL and Key are missing from environment variables.")
-    return create_client(SUPABASE_URL, SUPABASE_KEY)
+# `toordinal()` của 1970-01-01, để đổi số ngày kể từ epoch sang ordinal
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
 
-supabase = init_supabase()
+# Số thẻ tối đa trong một request upsert gold_time
+GOLD_TIME_CHUNK_SIZE = 500
 
-# Load flashcards from Supabase
+# Khoảng thời gian tối thiểu (giây) giữa hai lần hỏi thay đổi theo `updated_at`
+FLASHCARDS_DELTA_INTERVAL = 60
+
+# Số thẻ mỗi trang ở trang Bộ sưu tập
+COLLECTION_PAGE_SIZE = 50
+
+# Thời gian (giây) đệm kết quả thống kê tổng hợp
+STATISTICS_TTL = 60
+
+# Nhóm đến hạn của backend → biểu tượng của `get_priority_icon`
+STATUS_ICONS = {'overdue': '🔴', 'due_1d': '🟠', 'due_2d': '🔵', 'later': '🟢'}
+
+# Chuyển `gold_time` sang Timestamp cho các thẻ vừa tải (một lần parse cho cả cột)
+def parse_flashcards(flashcards):
+    gold_times = pd.to_datetime(
+        pd.Series([card.get('gold_time') or None for card in flashcards], dtype=object),
+        format='ISO8601',
+        errors='coerce',
+    )
+    for card, gold_time in zip(flashcards, gold_times):
+        card['gold_time'] = gold_time
+    return flashcards
+
+# Khóa sắp xếp thẻ: quá hạn trước (theo số ngày quá hạn, cùng ngày thì gold_time muộn hơn
+# trước), rồi thẻ chưa đến hạn theo gold_time tăng dần, thẻ không có gold_time cuối cùng.
+# Trả về ba mảng int64 (số ngày quá hạn, gold_time chưa đến hạn, -ngày), so theo thứ tự đó;
+# hàng đợi đến hạn (utils/navigate.py) dùng cùng khóa này.
+def flashcard_sort_keys(gold_times, now=None):
+    no_key = np.iinfo(np.int64).max
+    day_ns = 86400 * 10**9
+    now = pd.Timestamp(now if now is not None else pd.Timestamp.now()).as_unit('ns').value
+    gold_times = pd.DatetimeIndex(gold_times).as_unit('ns')
+    valid = ~gold_times.isna()
+    gold_ns = gold_times.asi8
+    overdue = valid & (gold_ns < now)
+
+    overdue_days = np.where(overdue, np.floor_divide(gold_ns - now, day_ns), no_key)
+    upcoming = np.where(valid & ~overdue, gold_ns, no_key)
+    ordinal = np.where(valid, -(np.floor_divide(gold_ns, day_ns) + EPOCH_ORDINAL), 0)
+    return overdue_days, upcoming, ordinal
+
+# Sắp xếp thẻ theo `flashcard_sort_keys`, một lần `np.lexsort` (ổn định) cho cả bộ thẻ
+def sort_flashcards(flashcards, now=None):
+    if not flashcards:
+        return flashcards
+
+    overdue_days, upcoming, ordinal = flashcard_sort_keys([card['gold_time'] for card in flashcards], now)
+    order = np.lexsort((ordinal, upcoming, overdue_days))
+    flashcards[:] = [flashcards[i] for i in order]
+    return flashcards
+
+# Load flashcards from storage
 def load_flashcards():
     try:
         user_id = st.session_state.get('user_id')
         if not user_id:
             raise ValueError("User is not authenticated.")
 
-        data = supabase.table('flashcards').select('*').eq('user_id', user_id).execute()
-        flashcards = data.data if data.data else []
-        today = pd.Timestamp.now()
-        for card in flashcards:
-            gold_time_raw = card.get('gold_time')
-            card['gold_time'] = pd.to_datetime(gold_time_raw, errors='coerce') if gold_time_raw else pd.NaT
-        
-        # Sort flashcards by gold_time
-        flashcards.sort(
-            key=lambda x: (
-                ((x['gold_time'] - today).days if pd.notna(x['gold_time']) and x['gold_time'] < today else float('inf')),
-                (x['gold_time'] if pd.notna(x['gold_time']) and x['gold_time'] >= today else float('inf')),
-                (-x['gold_time'].toordinal() if pd.notna(x['gold_time']) else 0)
-            )
-        )
-        return flashcards
+        flashcards = get_storage().list_flashcards(user_id)
+        return sort_flashcards(parse_flashcards(flashcards))
     except Exception as e:
-        st.error(f"Error fetching flashcards from Supabase: {e}")
+        st.error(f"Error fetching flashcards: {e}")
         return []
 
-# Add a new flashcard to Supabase
+# Load one page of flashcards (range query), trả về (các thẻ, tổng số thẻ)
+def load_flashcards_page(page, page_size=COLLECTION_PAGE_SIZE):
+    try:
+        user_id = st.session_state.get('user_id')
+        if not user_id:
+            raise ValueError("User is not authenticated.")
+
+        flashcards, total = get_storage().list_flashcards_page(user_id, page * page_size, page_size)
+        return parse_flashcards(flashcards), total
+    except Exception as e:
+        st.error(f"Error fetching flashcards: {e}")
+        return [], 0
+
+# Trang thẻ đang xem ở trang Bộ sưu tập, giữ trong session_state tới khi đổi trang
+# hoặc bộ thẻ bị vô hiệu hóa (thêm/sửa/xóa/đồng bộ)
+def get_cached_flashcards_page(page, page_size=COLLECTION_PAGE_SIZE):
+    key = (st.session_state.get('user_id'), page, page_size)
+    cache = st.session_state.get('flashcards_page_cache')
+    if cache is None or cache['key'] != key:
+        flashcards, total = load_flashcards_page(page, page_size)
+        cache = {'key': key, 'flashcards': flashcards, 'total': total}
+        st.session_state.flashcards_page_cache = cache
+    return cache['flashcards'], cache['total']
+
+# Load flashcards changed after `since` (cột `updated_at`)
+def load_flashcard_changes(since):
+    user_id = st.session_state.get('user_id')
+    if not user_id:
+        raise ValueError("User is not authenticated.")
+
+    return parse_flashcards(get_storage().list_flashcards(user_id, updated_after=since))
+
+def _latest_updated_at(flashcards, default=None):
+    return max((card['updated_at'] for card in flashcards if card.get('updated_at')), default=default)
+
+def _store_flashcards_cache(user_id, flashcards):
+    st.session_state.flashcards_cache = {
+        'user_id': user_id,
+        'flashcards': flashcards,
+        'cursor': _latest_updated_at(flashcards),
+        'checked_at': datetime.now(),
+    }
+
+# Bộ thẻ của người học được giữ trong session_state giữa các lần rerun. Chỉ tải lại toàn
+# bộ khi bị vô hiệu hóa (thêm/sửa/xóa/đồng bộ); ngoài ra, tối đa mỗi
+# FLASHCARDS_DELTA_INTERVAL giây hỏi các thẻ có `updated_at` mới hơn rồi gộp vào.
+def get_cached_flashcards():
+    user_id = st.session_state.get('user_id')
+    cache = st.session_state.get('flashcards_cache')
+    now = datetime.now()
+
+    if cache is None or cache['user_id'] != user_id:
+        flashcards = load_flashcards()
+        _store_flashcards_cache(user_id, flashcards)
+        return flashcards
+
+    # Bảng chưa có cột `updated_at` thì chỉ dựa vào vô hiệu hóa tường minh
+    if cache['cursor'] and (now - cache['checked_at']).total_seconds() >= FLASHCARDS_DELTA_INTERVAL:
+        cache['checked_at'] = now
+        try:
+            changes = load_flashcard_changes(cache['cursor'])
+        except Exception as e:
+            st.error(f"Error fetching flashcard changes: {e}")
+            changes = []
+        if changes:
+            changed_ids = {card['id'] for card in changes}
+            flashcards = [card for card in cache['flashcards'] if card['id'] not in changed_ids] + changes
+            cache['flashcards'] = sort_flashcards(flashcards)
+            cache['cursor'] = _latest_updated_at(changes, cache['cursor'])
+
+    return cache['flashcards']
+
+# Bỏ bộ đệm thẻ, lần gọi `get_cached_flashcards` tiếp theo sẽ tải lại
+def invalidate_flashcards_cache():
+    st.session_state.pop('flashcards_cache', None)
+    st.session_state.pop('flashcards_page_cache', None)
+
+# Add a new flashcard to storage
 def add_flashcard(word, meaning, example):
     try:
         user_id = st.session_state.get('user_id')
         if not user_id:
             raise ValueError("User is not authenticated.")
 
-        supabase.table('flashcards').insert({
-            "user_id": user_id,
+        get_storage().add_flashcard(user_id, {
             "word": word,
             "meaning": meaning,
             "example": example,
             "gold_time": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }).execute()
+        })
+        invalidate_flashcards_cache()
     except Exception as e:
         st.error(f"Error adding flashcard: {e}")
 
 
-# Update a flashcard from Supabase
+# Khóa so trùng từ vựng: chuẩn hóa Unicode (NFKC, gộp full/half-width), bỏ khoảng
+# trắng hai đầu, không phân biệt hoa thường
+def normalize_word(word):
+    return unicodedata.normalize('NFKC', word or '').strip().casefold()
+
+# Tập từ đã chuẩn hóa của bộ thẻ đang đệm, dựng lại khi bộ thẻ đổi
+def get_deck_word_index():
+    flashcards = get_cached_flashcards()
+    cache = st.session_state.flashcards_cache
+    if cache.get('word_index_deck') is not flashcards:
+        cache['word_index'] = {normalize_word(card['word']) for card in flashcards}
+        cache['word_index_deck'] = flashcards
+    return cache['word_index']
+
+# Bộ đệm bộ thẻ của người học hiện tại (nếu có); trang Bộ sưu tập sẽ tải lại trang đang xem
+def _own_flashcards_cache():
+    st.session_state.pop('flashcards_page_cache', None)
+    cache = st.session_state.get('flashcards_cache')
+    if cache is None or cache['user_id'] != st.session_state.get('user_id'):
+        return None
+    return cache
+
+# Bỏ các thẻ đã xóa khỏi bộ đệm
+def remove_from_flashcards_cache(card_ids):
+    cache = _own_flashcards_cache()
+    if cache is not None:
+        card_ids = set(card_ids)
+        cache['flashcards'] = [card for card in cache['flashcards'] if card['id'] not in card_ids]
+
+# Áp `fields` vừa ghi lên các thẻ trong bộ đệm
+def patch_flashcards_cache(card_ids, fields):
+    cache = _own_flashcards_cache()
+    if cache is not None:
+        card_ids = set(card_ids)
+        fields = parse_flashcards([dict(fields)])[0] if 'gold_time' in fields else fields
+        cache['flashcards'] = sort_flashcards([
+            {**card, **fields} if card['id'] in card_ids else card
+            for card in cache['flashcards']
+        ])
+
+# Gộp các thẻ vừa thêm vào bộ đệm thay vì tải lại cả bộ thẻ
+def merge_into_flashcards_cache(new_cards):
+    cache = _own_flashcards_cache()
+    if cache is None or not new_cards:
+        return
+    new_cards = parse_flashcards([dict(card) for card in new_cards])
+    flashcards = sort_flashcards(cache['flashcards'] + new_cards)
+    if cache.get('word_index_deck') is cache['flashcards']:
+        cache['word_index'].update(normalize_word(card['word']) for card in new_cards)
+        cache['word_index_deck'] = flashcards
+    cache['flashcards'] = flashcards
+    cache['cursor'] = _latest_updated_at(new_cards, cache['cursor'])
+
+# Thêm nhiều thẻ trong một request, bỏ qua từ đã có trong bộ thẻ (hoặc trùng trong
+# chính danh sách). Trả về (các thẻ đã thêm, các thẻ bị bỏ qua).
+def bulk_add_flashcards(flashcards):
+    try:
+        user_id = st.session_state.get('user_id')
+        if not user_id:
+            raise ValueError("User is not authenticated.")
+
+        known_words = set(get_deck_word_index())
+        gold_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        rows = []
+        skipped = []
+        for card in flashcards:
+            key = normalize_word(card['word'])
+            if not key or key in known_words:
+                skipped.append(card)
+                continue
+            known_words.add(key)
+            rows.append({
+                "word": card['word'],
+                "meaning": card['meaning'],
+                "example": card.get('example', ''),
+                "gold_time": gold_time,
+            })
+
+        added = get_storage().add_flashcards(user_id, rows) if rows else []
+        merge_into_flashcards_cache(added)
+        return added, skipped
+    except Exception as e:
+        st.error(f"Error adding flashcards: {e}")
+        return [], []
+
+# Update a flashcard from storage
 def update_flashcard(card_id, new_word, new_meaning, new_example):
     try:
         user_id = st.session_state.get('user_id')
         if not user_id:
             raise ValueError("User is not authenticated.")
 
-        supabase.table('flashcards').update({
+        get_storage().update_flashcard(user_id, card_id, {
             "word": new_word,
             "meaning": new_meaning,
             "example": new_example
-        }).eq('id', card_id).eq('user_id', user_id).execute()
+        })
+        invalidate_flashcards_cache()
     except Exception as e:
         st.error(f"Error updating flashcard: {e}")
 
-# Delete a flashcard from Supabase
+# Delete a flashcard from storage
 def delete_flashcard(card_id):
+    delete_flashcards([card_id])
+
+# Xóa nhiều thẻ (kèm ghi chú) bằng bộ lọc `in_`: số request cố định, không phụ thuộc
+# số thẻ. Thẻ đã xóa được bỏ khỏi bộ đệm thay vì tải lại cả bộ thẻ.
+def delete_flashcards(card_ids):
     try:
         user_id = st.session_state.get('user_id')
         if not user_id:
             raise ValueError("User is not authenticated.")
 
-        supabase.table('flashcards').delete().eq('id', card_id).eq('user_id', user_id).execute()
-        supabase.table('notes').delete().eq('flashcard_id', card_id).eq('user_id', user_id).execute()  # Remove associated notes
+        get_storage().delete_flashcards(user_id, card_ids)  # Also removes associated notes
+        remove_from_flashcards_cache(card_ids)
+        invalidate_notes_cache()
     except Exception as e:
-        st.error(f"Error deleting flashcard or notes: {e}")
+        st.error(f"Error deleting flashcards or notes: {e}")
 
-# Update an existing flashcard's gold_time in Supabase
-def update_gold_time(card_id, gold_time):
+# Gán cùng `fields` (ví dụ gold_time) cho nhiều thẻ trong một request
+def update_flashcards(card_ids, fields):
     try:
-        supabase.table('flashcards').update({'gold_time': gold_time.strftime('%Y-%m-%d %H:%M:%S')}).eq('id', card_id).execute()
+        user_id = st.session_state.get('user_id')
+        if not user_id:
+            raise ValueError("User is not authenticated.")
+
+        get_storage().update_flashcards(user_id, card_ids, fields)
+        patch_flashcards_cache(card_ids, fields)
+    except Exception as e:
+        st.error(f"Error updating flashcards: {e}")
+
+# Ghi gold_time cho nhiều thẻ của `user_id` theo lô (mỗi lô một lần UPDATE của backend,
+# chỉ chạm cột gold_time). `updates`: danh sách (card_id, gold_time); thẻ xuất hiện nhiều
+# lần thì giữ giá trị cuối. `on_progress(written, total)` được gọi sau mỗi lô. Mọi id đã
+# xử lý được thêm vào `written`; id không còn tồn tại (đã bị xóa) được thêm cả vào `missing`.
+# Không bắt lỗi, dùng được ngoài phiên Streamlit (ví dụ luồng ghi nền).
+def write_gold_times(user_id, updates, chunk_size=GOLD_TIME_CHUNK_SIZE, on_progress=None, written=None, missing=None):
+    written = set() if written is None else written
+    gold_times = dict(updates)
+    card_ids = list(gold_times)
+
+    for start in range(0, len(card_ids), chunk_size):
+        chunk_ids = card_ids[start:start + chunk_size]
+        updated = get_storage().set_gold_times(
+            user_id,
+            {card_id: pd.Timestamp(gold_times[card_id]).strftime('%Y-%m-%d %H:%M:%S') for card_id in chunk_ids},
+        )
+        if missing is not None:
+            missing.update(card_id for card_id in chunk_ids if card_id not in updated)
+        written.update(chunk_ids)
+        if on_progress:
+            on_progress(len(written), len(card_ids))
+    return written
+
+# Ghi gold_time cho nhiều thẻ của người học hiện tại, trả về tập card_id đã xử lý
+# (kể cả thẻ đã bị xóa, được báo riêng và không thử lại)
+def bulk_update_gold_time(updates, chunk_size=GOLD_TIME_CHUNK_SIZE, on_progress=None):
+    written = set()
+    missing = set()
+    try:
+        user_id = st.session_state.get('user_id')
+        if not user_id:
+            raise ValueError("User is not authenticated.")
+
+        write_gold_times(user_id, updates, chunk_size, on_progress, written, missing)
     except Exception as e:
         st.error(f"Error updating gold_time: {e}")
+    if missing:
+        st.warning(f"Bỏ qua {len(missing)} thẻ đã bị xóa.")
+    return written
 
 # Load all notes
 def load_all_notes():
@@ -106,10 +355,9 @@ def load_all_notes():
         user_id = st.session_state.get('user_id')
         if not user_id:
             raise ValueError("User is not authenticated.")
-        data = supabase.table('notes').select('*').eq('user_id', user_id).execute()
-        return data.data if data.data else []
+        return get_storage().list_notes(user_id)
     except Exception as e:
-        st.error(f"Error fetching notes from Supabase: {e}")
+        st.error(f"Error fetching notes: {e}")
         return []
 
 # Load all notes associated with a flashcard
@@ -119,34 +367,57 @@ def load_notes(flashcard_id):
         if not user_id:
             raise ValueError("User is not authenticated.")
 
-        data = supabase.table('notes').select('*').eq('flashcard_id', flashcard_id).eq('user_id', user_id).execute()
-        return data.data if data.data else []
+        return get_storage().list_notes(user_id, flashcard_id)
     except Exception as e:
-        st.error(f"Error fetching notes from Supabase: {e}")
+        st.error(f"Error fetching notes: {e}")
         return []
 
+# Ghi chú của người học được tải một lần (một truy vấn cho mọi thẻ), nhóm theo
+# `flashcard_id` và giữ trong session_state; thêm/sửa/xóa ghi chú sẽ vô hiệu hóa.
+def get_cached_notes():
+    user_id = st.session_state.get('user_id')
+    cache = st.session_state.get('notes_cache')
+    if cache is None or cache['user_id'] != user_id:
+        cache = _store_notes_cache(user_id, load_all_notes())
+    return cache['notes']
+
+def _store_notes_cache(user_id, notes):
+    notes_by_card = {}
+    for note in notes:
+        notes_by_card.setdefault(note['flashcard_id'], []).append(note)
+    st.session_state.notes_cache = {'user_id': user_id, 'notes': notes_by_card}
+    return st.session_state.notes_cache
+
+# Ghi chú của một thẻ, lấy từ bộ đệm
+def get_notes(flashcard_id):
+    return get_cached_notes().get(flashcard_id, [])
+
+def invalidate_notes_cache():
+    st.session_state.pop('notes_cache', None)
+
 # Add a note for a flashcard
 def add_note(flashcard_id, title, content):
     try:
         user_id = st.session_state.get('user_id')
         if not user_id:
             raise ValueError("User is not authenticated.")
-        supabase.table('notes').insert({
-            "user_id": user_id,
+        get_storage().add_note(user_id, {
             "flashcard_id": flashcard_id,
             "title": title,
             "content": content
-        }).execute()
+        })
+        invalidate_notes_cache()
     except Exception as e:
         st.error(f"Error adding note: {e}")
 
-# Delete a note from Supabase
+# Delete a note from storage
 def delete_note(note_id):
     try:
         user_id = st.session_state.get('user_id')
         if not user_id:
             raise ValueError("User is not authenticated.")
-        supabase.table('notes').delete().eq('id', note_id).eq('user_id', user_id).execute()
+        get_storage().delete_note(user_id, note_id)
+        invalidate_notes_cache()
     except Exception as e:
         st.error(f"Error deleting note: {e}")
 
@@ -155,52 +426,113 @@ def update_note(note_id, new_title, new_content):
         user_id = st.session_state.get('user_id')
         if not user_id:
             raise ValueError("User is not authenticated.")
-        supabase.table('notes').update({
+        get_storage().update_note(user_id, note_id, {
             "title": new_title,
             "content": new_content
-        }).eq('id', note_id).eq('user_id', user_id).execute()
+        })
+        invalidate_notes_cache()
     except Exception as e:
         st.error(f"Error updating note: {e}")
         
-# Load study progress data
-def load_study_progress():
+# Thống kê tổng hợp từ kho dữ liệu (chỉ tải một dòng mỗi nhóm), được đệm trong
+# STATISTICS_TTL giây cho mỗi người học
+@st.cache_data(ttl=STATISTICS_TTL, show_spinner=False)
+def _note_counts(user_id):
+    return get_storage().count_notes_by_flashcard(user_id)
+
+@st.cache_data(ttl=STATISTICS_TTL, show_spinner=False)
+def _status_counts(user_id):
+    return get_storage().count_flashcards_by_status(user_id, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+
+# Số ghi chú theo thẻ: {flashcard_id: số ghi chú}
+def load_note_counts():
     try:
         user_id = st.session_state.get('user_id')
         if not user_id:
             raise ValueError("User is not authenticated.")
-
-        response = supabase.table('study_progress').select('*').eq('user_id', user_id).order('date').execute()
-        return pd.DataFrame(response.data if response.data else [])
+        return _note_counts(user_id)
     except Exception as e:
-        st.error(f"Error fetching study progress data: {e}")
-        return pd.DataFrame()
+        st.error(f"Error fetching note counts: {e}")
+        return {}
 
+# Số thẻ theo biểu tượng trạng thái của `get_priority_icon`
+def load_status_counts():
+    try:
+        user_id = st.session_state.get('user_id')
+        if not user_id:
+            raise ValueError("User is not authenticated.")
+        counts = _status_counts(user_id)
+        return {icon: int(counts.get(bucket) or 0) for bucket, icon in STATUS_ICONS.items()}
+    except Exception as e:
+        st.error(f"Error fetching flashcard status counts: {e}")
+        return dict.fromkeys(STATUS_ICONS.values(), 0)
 
-def update_study_progress(study_progress):
-    today_str = datetime.now().strftime('%Y-%m-%d')
+# Load study progress data
+def load_study_progress():
     try:
         user_id = st.session_state.get('user_id')
         if not user_id:
             raise ValueError("User is not authenticated.")
-        # Check if there's already an entry for today
-        response = supabase.table('study_progress').select('*').eq('user_id', user_id).eq('date', today_str).execute()
-        if response.data:
-            # Update existing entry
-            existing_progress = response.data[0]
-            supabase.table('study_progress').update({
-                "good_count": existing_progress["good_count"] + study_progress['good_count'],
-                "normal_count": existing_progress["normal_count"] + study_progress['normal_count'],
-                "bad_count": existing_progress["bad_count"] + study_progress['bad_count']
-            }).eq('user_id', user_id).eq('date', today_str).execute()
-        else:
-            # Insert new entry if no entry exists for today
-            new_entry = {
-                "user_id": user_id,
-                "date": today_str,
-                "good_count": study_progress['good_count'],
-                "normal_count": study_progress['normal_count'],
-                "bad_count": study_progress['bad_count']
-            }
-            supabase.table('study_progress').insert(new_entry).execute()
+
+        return pd.DataFrame(get_storage().list_study_progress(user_id))
     except Exception as e:
-        print(f"Error updating study progress: {e}")
\ No newline at end of file
+        st.error(f"Error fetching study progress data: {e}")
+        return pd.DataFrame()
+
+# Tiến độ học được đệm trong session_state tối đa STATISTICS_TTL giây (luồng ghi nền có
+# thể cộng thêm lượt ôn bất cứ lúc nào). Trả về DataFrame mới mỗi lần gọi.
+def get_cached_study_progress():
+    user_id = st.session_state.get('user_id')
+    cache = st.session_state.get('study_progress_cache')
+    if (cache is None or cache['user_id'] != user_id
+            or (datetime.now() - cache['loaded_at']).total_seconds() >= STATISTICS_TTL):
+        study_progress = load_study_progress()
+        cache = _store_study_progress_cache(user_id, study_progress.to_dict('records'))
+    return pd.DataFrame(cache['rows'])
+
+def _store_study_progress_cache(user_id, rows):
+    st.session_state.study_progress_cache = {'user_id': user_id, 'rows': rows, 'loaded_at': datetime.now()}
+    return st.session_state.study_progress_cache
+
+def invalidate_study_progress_cache():
+    st.session_state.pop('study_progress_cache', None)
+
+# Tải song song bộ thẻ, toàn bộ ghi chú và tiến độ học ngay sau khi đăng nhập rồi đưa vào
+# các bộ đệm của phiên, nên thời gian chờ bằng truy vấn chậm nhất thay vì tổng của chúng.
+# Các luồng chỉ gọi backend lưu trữ (dùng chung một client, một pool kết nối HTTP);
+# session_state chỉ được ghi ở luồng của phiên.
+def bootstrap_user_data(user_id):
+    storage = get_storage()
+    with ThreadPoolExecutor(max_workers=3, thread_name_prefix="bootstrap") as pool:
+        flashcards = pool.submit(storage.list_flashcards, user_id)
+        notes = pool.submit(storage.list_notes, user_id)
+        study_progress = pool.submit(storage.list_study_progress, user_id)
+
+    for name, future in (("flashcards", flashcards), ("notes", notes), ("study progress", study_progress)):
+        if future.exception() is not None:
+            # Bộ đệm tương ứng sẽ được tải lại (và báo lỗi) ở lần dùng đầu tiên
+            print(f"Error prefetching {name}: {future.exception()}")
+    if flashcards.exception() is None:
+        _store_flashcards_cache(user_id, sort_flashcards(parse_flashcards(flashcards.result())))
+    if notes.exception() is None:
+        _store_notes_cache(user_id, notes.result())
+    if study_progress.exception() is None:
+        _store_study_progress_cache(user_id, study_progress.result())
+
+# Cộng dồn nguyên tử số lượt ôn của `user_id` cho một hoặc nhiều ngày (không bắt lỗi).
+# `progress_by_date`: {date_str: {good_count, normal_count, bad_count}}
+def increment_study_progress(user_id, progress_by_date):
+    get_storage().increment_study_progress(user_id, progress_by_date)
+
+# Cộng tiến độ theo từng lượt ôn có id (bỏ qua lượt đã ghi), xem StorageBackend.record_study_events
+def record_study_events(user_id, events):
+    get_storage().record_study_events(user_id, events)
+
+# Cộng số lượt ôn của người học hiện tại cho một hoặc nhiều ngày (một lần ghi).
+# `progress_by_date`: {date_str: {good_count, normal_count, bad_count}}. Để lỗi nổi lên cho
+# nơi gọi, vì nơi gọi chỉ được đánh dấu lượt ôn là đã tính khi ghi thành công.
+def update_study_progress(progress_by_date):
+    user_id = st.session_state.get('user_id')
+    if not user_id:
+        raise ValueError("User is not authenticated.")
+    increment_study_progress(user_id, progress_by_date)
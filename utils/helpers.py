@@ -100,22 +100,6 @@ def get_priority_icon(gold_time):
     else:
         return "🟢"  # Enough time remaining
 
-def stream_data(text, delay=0.02):
-    """
-    Chia văn bản thành các từ và tạo luồng văn bản dần dần để hiển thị tuần tự.
-    
-    Parameters:
-        text (str): Văn bản cần hiển thị dần dần.
-        delay (float): Thời gian trễ giữa mỗi từ (tính bằng giây).
-    
-    Yields:
-        str: Mỗi từ trong văn bản kèm khoảng trắng.
-    """
-    import time
-    for word in text.split(" "):
-        yield word + " "
-        time.sleep(delay)
-
 def load_environment_variables():
     load_dotenv()
     required_vars = ['SUPABASE_URL', 'SUPABASE_KEY', 'GEMINI_KEY']
@@ -0,0 +1,76 @@
+# utils/jsonstream.py
+
+import json
+
+# Parser tăng dần cho một mảng JSON đến theo từng đoạn (stream của LLM): mỗi phần tử
+# được trả về ngay khi đóng, không cần chờ hết phản hồi. Phần tử hỏng chỉ làm mất chính
+# nó (ghi vào `errors`); văn bản trước dấu `[` đầu tiên (ví dụ ```json) bị bỏ qua.
+class JsonArrayStream:
+
+    def __init__(self):
+        self.buffer = ""
+        self.position = 0
+        self.started = False
+        self.complete = False
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.item_start = None
+        self.errors = []
+
+    # Thêm một đoạn văn bản, trả về các phần tử vừa đóng trong đoạn đó
+    def feed(self, text):
+        self.buffer += text
+        items = []
+        while self.position < len(self.buffer) and not self.complete:
+            char = self.buffer[self.position]
+            if not self.started:
+                if char == "[":
+                    self.started = True
+                    self.depth = 1
+            elif self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                if self.depth == 1 and self.item_start is None:
+                    self.item_start = self.position
+                self.in_string = True
+            elif char in "[{":
+                if self.depth == 1:
+                    self.item_start = self.position
+                self.depth += 1
+            elif char in "]}":
+                self.depth -= 1
+                if self.depth == 1 and self.item_start is not None:
+                    self._close_item(self.position + 1, items)
+                elif self.depth == 0:
+                    self.complete = True
+            elif char == "," and self.depth == 1 and self.item_start is not None:
+                # Phần tử vô hướng (số, chuỗi, true/false/null) kết thúc ở dấu phẩy
+                self._close_item(self.position, items)
+            elif self.depth == 1 and self.item_start is None and not char.isspace() and char != ",":
+                self.item_start = self.position
+            self.position += 1
+
+        # Phần tử vô hướng cuối cùng kết thúc ở dấu `]`
+        if self.complete and self.item_start is not None:
+            self._close_item(self.position - 1, items)
+        # Bỏ phần đã xử lý để bộ đệm không phình theo độ dài phản hồi
+        if self.item_start is None:
+            self.buffer = self.buffer[self.position:]
+            self.position = 0
+        return items
+
+    def _close_item(self, end, items):
+        raw = self.buffer[self.item_start:end].strip()
+        self.item_start = None
+        if not raw:
+            return
+        try:
+            items.append(json.loads(raw))
+        except ValueError as e:
+            self.errors.append((raw, e))
@@ -0,0 +1,88 @@
+# utils/llm_cache.py
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+
+# Bộ đệm phản hồi LLM theo nội dung: khóa là SHA-256 của (mô hình, cấu hình sinh, prompt),
+# lưu trên đĩa bằng SQLite nên còn nguyên sau khi khởi động lại. Mục quá LLM_CACHE_TTL
+# giây bị bỏ khi đọc; vượt LLM_CACHE_MAX_ENTRIES mục thì bỏ các mục ít dùng gần đây nhất.
+# Đặt LLM_CACHE=0 để tắt.
+
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "data/llm_cache.sqlite3")
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 7 * 86400))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 5000))
+
+
+def llm_cache_enabled():
+    return os.getenv("LLM_CACHE", "1").lower() not in ("0", "false", "no", "off")
+
+
+def response_cache_key(model_name, generation_config, prompt):
+    payload = json.dumps(
+        {"model": model_name, "config": generation_config, "prompt": prompt},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+
+    def __init__(self, path=LLM_CACHE_PATH, ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_responses ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " response TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " used_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_responses_used_at ON llm_responses (used_at)")
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created_at FROM llm_responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE llm_responses SET used_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def put(self, key, model_name, response):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, model, response, created_at, used_at) VALUES (?, ?, ?, ?, ?)",
+                (key, model_name, response, now, now),
+            )
+            self._conn.execute(
+                "DELETE FROM llm_responses WHERE key IN "
+                "(SELECT key FROM llm_responses ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_responses")
@@ -1,9 +1,72 @@
 import google.generativeai as genai
 from dotenv import load_dotenv
 import os
+import re
 import json
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
 import typing_extensions as typing
+from utils.llm_cache import ResponseCache, response_cache_key, llm_cache_enabled
+from utils.jsonstream import JsonArrayStream
+
+MODEL_NAME = "gemini-1.5-flash"
+
+# Trích xuất flashcard: văn bản dài được cắt theo câu thành các đoạn không quá
+# EXTRACT_CHUNK_TOKENS token (ước lượng), gửi song song tối đa EXTRACT_MAX_WORKERS đoạn
+EXTRACT_CHUNK_TOKENS = 300
+EXTRACT_MAX_WORKERS = 4
+
+# Kết thúc câu (tiếng Nhật và Latin) hoặc xuống dòng
+SENTENCE_END = re.compile(r"(?<=[。！？!?.])\s*|\n+")
+CJK_CHAR = re.compile(r"[\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]")
+
+
+# Ước lượng số token: mỗi ký tự CJK ~ 1 token, văn bản Latin ~ 4 ký tự một token
+def estimate_tokens(text):
+    cjk = len(CJK_CHAR.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+def split_sentences(text):
+    return [sentence for sentence in (part.strip() for part in SENTENCE_END.split(text)) if sentence]
+
+# Gộp các câu liên tiếp thành đoạn không quá `max_tokens`; câu dài hơn giới hạn bị cắt
+# theo ký tự để không đoạn nào vượt giới hạn
+def chunk_text(text, max_tokens=EXTRACT_CHUNK_TOKENS):
+    chunks = []
+    current = []
+    current_tokens = 0
+    for sentence in split_sentences(text):
+        tokens = estimate_tokens(sentence)
+        if tokens > max_tokens:
+            step = max(1, len(sentence) * max_tokens // tokens)
+            pieces = [sentence[start:start + step] for start in range(0, len(sentence), step)]
+        else:
+            pieces = [sentence]
+        for piece in pieces:
+            piece_tokens = estimate_tokens(piece)
+            if current and current_tokens + piece_tokens > max_tokens:
+                chunks.append(" ".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+# Kiểm tra một phần tử trích xuất theo schema Flashcard: word và meaning là chuỗi khác
+# rỗng, example là chuỗi (thiếu thì để trống). Sai schema trả về None.
+def validate_flashcard(item):
+    if not isinstance(item, dict):
+        return None
+    word, meaning, example = item.get('word'), item.get('meaning'), item.get('example') or ''
+    if not isinstance(word, str) or not word.strip() or not isinstance(meaning, str) or not meaning.strip():
+        return None
+    if not isinstance(example, str):
+        return None
+    return {'word': word.strip(), 'meaning': meaning.strip(), 'example': example.strip()}
 
 
 # class Flashcard(typing.TypedDict):
@@ -43,34 +106,80 @@ class GeminiFlash:
                 "threshold": "BLOCK_NONE",
             },
         ]
-    
+        self.json_generation_config = {
+            "temperature": 0.5,
+            "top_p": 1,
+            "top_k": 25,
+            "max_output_tokens": 1000,
+            "response_mime_type": "application/json",
+            # "response_schema": response_schema
+        }
+        # GenerativeModel dùng lại theo (API key, cấu hình sinh); phản hồi được đệm trên đĩa
+        self._models = {}
+        self._configured_key = None
+        self._lock = threading.Lock()
+        self.response_cache = ResponseCache() if llm_cache_enabled() else None
+
+    # `genai.configure` chỉ chạy khi API key đổi; model giữ client của nó sau lần gọi đầu
+    # (`api_key` truyền tường minh khi gọi từ luồng khác, nơi không có session_state)
+    def get_model(self, generation_config, api_key=None):
+        api_key = api_key or st.session_state.GEMINI_KEY
+        model_key = (api_key, json.dumps(generation_config, sort_keys=True))
+        with self._lock:
+            model = self._models.get(model_key)
+            if model is None:
+                if self._configured_key != api_key:
+                    genai.configure(api_key=api_key)
+                    self._configured_key = api_key
+                model = genai.GenerativeModel(
+                    model_name=MODEL_NAME,
+                    generation_config=generation_config,
+                )
+                self._models[model_key] = model
+        return model
+
+    # Gọi model, trả về ngay nếu cùng (model, cấu hình, prompt) đã có trong bộ đệm
+    def generate(self, prompt, generation_config, api_key=None):
+        key = response_cache_key(MODEL_NAME, generation_config, prompt)
+        if self.response_cache is not None:
+            cached = self.response_cache.get(key)
+            if cached is not None:
+                return cached
+
+        response = self.get_model(generation_config, api_key).generate_content(prompt, safety_settings=self.safe_settings)
+        text = response.text
+        if self.response_cache is not None and text:
+            self.response_cache.put(key, MODEL_NAME, text)
+        return text
+
+    # Như `generate` nhưng trả về từng đoạn văn bản ngay khi model sinh ra
+    # (`stream=True`); đủ cả phản hồi thì mới ghi vào bộ đệm
+    def generate_stream(self, prompt, generation_config, api_key=None):
+        key = response_cache_key(MODEL_NAME, generation_config, prompt)
+        if self.response_cache is not None:
+            cached = self.response_cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+
+        response = self.get_model(generation_config, api_key).generate_content(prompt, safety_settings=self.safe_settings, stream=True)
+        chunks = []
+        for chunk in response:
+            text = chunk.text
+            if text:
+                chunks.append(text)
+                yield text
+        if self.response_cache is not None and chunks:
+            self.response_cache.put(key, MODEL_NAME, "".join(chunks))
+
     def run(self, prompt):
-        genai.configure(api_key=st.session_state.GEMINI_KEY)
-        model = genai.GenerativeModel(
-            model_name="gemini-1.5-flash",
-            generation_config=self.generation_config,
-        )
-        response = model.generate_content(prompt, safety_settings=self.safe_settings)
-        return response.text
+        return self.generate(prompt, self.generation_config)
     
-    def run_json(self, prompt, response_schema=""):
-        genai.configure(api_key=st.session_state.GEMINI_KEY)
-        model = genai.GenerativeModel(
-            model_name="gemini-1.5-flash",
-            generation_config={
-                "temperature": 0.5,
-                "top_p": 1,
-                "top_k": 25,
-                "max_output_tokens": 1000,
-                "response_mime_type": "application/json",
-                # "response_schema": response_schema
-            },
-        )
-        response = model.generate_content(prompt, safety_settings=self.safe_settings)
-        return response.text
+    def run_json(self, prompt, response_schema="", api_key=None):
+        return self.generate(prompt, self.json_generation_config, api_key)
     
-    def extract_flashcard_action(self, plain_text, level):
-        prompt = (
+    def extraction_prompt(self, plain_text, level):
+        return (
             "You are a helpful assistant designed to create concise and informative for Japanese language flashcards.\n"
             "N1: Advanced level, includes complex vocabulary often used in professional or academic contexts.\n"
             "N2: Upper-intermediate level, with vocabulary frequently used in business or media.\n"
@@ -87,13 +196,90 @@ class GeminiFlash:
             "Flashcard = {'word': str, 'meaning': str, 'example': str}\n"
             "Return: list[Flashcard]\n",
         )
+
+    # Trích xuất một đoạn theo stream: mỗi phần tử của mảng JSON được `emit` ngay khi
+    # đóng ngoặc. Phản hồi bị cắt trước khi mảng đóng (thường do max_output_tokens) thì
+    # chia đôi đoạn theo câu và làm lại, tới khi còn một câu; thẻ đã gửi trùng lại sẽ bị
+    # bỏ khi gộp.
+    def extract_chunk(self, chunk, level, emit, api_key=None):
         # new_flashcards = self.run_json(prompt, response_schema=list[Flashcard])
-        new_flashcards = self.run_json(prompt)
-        st.session_state['extracted_flashcards'] = json.loads(new_flashcards)
+        parser = JsonArrayStream()
+        for text in self.generate_stream(self.extraction_prompt(chunk, level), self.json_generation_config, api_key):
+            for item in parser.feed(text):
+                emit(item)
+        if parser.complete:
+            return len(parser.errors)
+
+        sentences = split_sentences(chunk)
+        if len(sentences) < 2:
+            raise ValueError("response ended before the JSON array was closed")
+        middle = len(sentences) // 2
+        return (
+            len(parser.errors)
+            + self.extract_chunk(" ".join(sentences[:middle]), level, emit, api_key)
+            + self.extract_chunk(" ".join(sentences[middle:]), level, emit, api_key)
+        )
+
+    # Cắt văn bản thành các đoạn và trích xuất song song. Thẻ hợp lệ được gộp (bỏ từ trùng
+    # theo từ đã chuẩn hóa) theo thứ tự đến và báo ngay qua `on_flashcard` ở luồng gọi.
+    # Trả về (các flashcard, các đoạn lỗi kèm lỗi, số phần tử sai schema bị bỏ).
+    def extract_flashcards(self, plain_text, level, on_flashcard=None):
+        from utils.database import normalize_word
+
+        chunks = chunk_text(plain_text)
+        api_key = st.session_state.GEMINI_KEY
+        arrived = queue.Queue()
+        flashcards = []
+        seen = set()
+        invalid = 0
+        with ThreadPoolExecutor(max_workers=EXTRACT_MAX_WORKERS, thread_name_prefix="extract") as pool:
+            futures = [pool.submit(self.extract_chunk, chunk, level, arrived.put, api_key) for chunk in chunks]
+            pending = set(futures)
+            while pending or not arrived.empty():
+                try:
+                    item = arrived.get(timeout=0.05)
+                except queue.Empty:
+                    pending = {future for future in pending if not future.done()}
+                    continue
+                flashcard = validate_flashcard(item)
+                if flashcard is None:
+                    invalid += 1
+                    continue
+                key = normalize_word(flashcard['word'])
+                if key in seen:
+                    continue
+                seen.add(key)
+                flashcards.append(flashcard)
+                if on_flashcard:
+                    on_flashcard(flashcard)
+
+        errors = []
+        for chunk, future in zip(chunks, futures):
+            if future.exception() is not None:
+                errors.append((chunk, future.exception()))
+            else:
+                invalid += future.result()
+        return flashcards, errors, invalid
+
+    # Hiện từng thẻ ngay khi trích xuất được; danh sách tạm được thay bằng danh sách chọn
+    # của trang Bộ sưu tập khi xong
+    def extract_flashcard_action(self, plain_text, level):
+        placeholder = st.empty()
+        live = placeholder.container()
+        new_flashcards, errors, invalid = self.extract_flashcards(
+            plain_text,
+            level,
+            on_flashcard=lambda flashcard: live.write(f"{flashcard['word']} - {flashcard['meaning']} - {flashcard['example']}"),
+        )
+        placeholder.empty()
+        st.session_state['extracted_flashcards'] = new_flashcards
+        if errors:
+            st.warning(f"Không trích xuất được {len(errors)} đoạn văn bản: " + "; ".join(f"{chunk[:30]}… ({error})" for chunk, error in errors))
+        if invalid:
+            st.warning(f"Bỏ qua {invalid} thẻ không đúng định dạng (word, meaning, example).")
     
-    def take_note_action(self):
-        card = st.session_state.flashcards[st.session_state.index]
-        prompt = (
+    def note_prompt(self, card, request):
+        return (
             "Bạn là một trợ lý hữu ích, được thiết kế để tạo các ghi chú ngắn gọn và dễ hiểu cho flashcard học ngôn ngữ.\n"
             # "Với mỗi flashcard, bạn sẽ nhận được một từ và nghĩa của từ đó.\n"
             # "Nhiệm vụ của bạn là tạo một ghi chú ngắn giúp người dùng ghi nhớ từ và cách sử dụng từ đó trong ngữ cảnh thực tế.\n"
@@ -105,10 +291,12 @@ class GeminiFlash:
             f"- **Nghĩa:** {card['meaning']}\n"
             f"- **Ví dụ:** {card['example']}\n\n"
             "### NHIỆM VỤ\n"
-            f"- **Yêu cầu:** {st.session_state.new_note_content}\n"
+            f"- **Yêu cầu:** {request}\n"
             "Hãy tạo ghi chú ngắn gọn (không được lặp lại thông tin trên), và trình bày dưới dạng markdown bằng tiếng Việt."
             "Note ngắn gọn không ghi tiêu đề, chỉ ghi plain text hoặc bôi đen thôi"
         )
-        # st.toast("prompt: " + prompt)
-        return self.run(prompt) 
-    
\ No newline at end of file
+
+    # Sinh ghi chú cho `card` theo yêu cầu `request`, trả về generator các đoạn văn bản
+    # (dùng với `st.write_stream`)
+    def stream_note(self, card, request):
+        return self.generate_stream(self.note_prompt(card, request), self.generation_config)
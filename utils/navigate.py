@@ -1,4 +1,86 @@
+import heapq
+import itertools
+import pandas as pd
 import streamlit as st
+from utils.database import flashcard_sort_keys
+
+
+# Hàng đợi thẻ đến hạn, cùng thứ tự với `sort_flashcards` (khóa tính tại thời điểm dựng
+# hàng đợi `now`). Đổi lịch một thẻ là O(log n): mục cũ bị đánh dấu bỏ và mục mới được
+# đẩy vào heap; đỉnh heap luôn được dọn sạch nên xem thẻ tiếp theo (`peek`) là O(1).
+class DueQueue:
+    _REMOVED = object()
+
+    def __init__(self, flashcards, now=None):
+        self.flashcards = flashcards
+        self.now = pd.Timestamp(now if now is not None else pd.Timestamp.now())
+        self.positions = {card['id']: position for position, card in enumerate(flashcards)}
+        self._counter = itertools.count()
+        self._entries = {}
+        self._heap = []
+        keys = zip(*flashcard_sort_keys([card['gold_time'] for card in flashcards], self.now)) if flashcards else ()
+        for card, key in zip(flashcards, keys):
+            entry = [tuple(int(part) for part in key), next(self._counter), card['id']]
+            self._entries[card['id']] = entry
+            self._heap.append(entry)
+        heapq.heapify(self._heap)
+
+    def _key(self, gold_time):
+        return tuple(int(part[0]) for part in flashcard_sort_keys([gold_time], self.now))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, card_id):
+        return card_id in self._entries
+
+    def _prune(self):
+        while self._heap and self._heap[0][2] is self._REMOVED:
+            heapq.heappop(self._heap)
+
+    # Thẻ đến hạn sớm nhất (không lấy ra khỏi hàng đợi)
+    def peek(self):
+        if not self._heap:
+            return None
+        return self.flashcards[self.positions[self._heap[0][2]]]
+
+    # `count` thẻ đến hạn sớm nhất theo thứ tự (không lấy ra khỏi hàng đợi). Duyệt cây
+    # heap từ gốc bằng một heap phụ nên chỉ chạm O(count) mục, không quét cả hàng đợi.
+    def upcoming(self, count):
+        cards = []
+        frontier = [(self._heap[0], 0)] if self._heap else []
+        while frontier and len(cards) < count:
+            entry, position = heapq.heappop(frontier)
+            if entry[2] is not self._REMOVED:
+                cards.append(self.flashcards[self.positions[entry[2]]])
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < len(self._heap):
+                    heapq.heappush(frontier, (self._heap[child], child))
+        return cards
+
+    def pop(self):
+        entry = heapq.heappop(self._heap)
+        del self._entries[entry[2]]
+        self._prune()
+        return self.flashcards[self.positions[entry[2]]]
+
+    # Đặt lại vị trí của thẻ theo gold_time mới
+    def reschedule(self, card_id, gold_time):
+        old_entry = self._entries.get(card_id)
+        if old_entry is not None:
+            old_entry[2] = self._REMOVED
+        entry = [self._key(gold_time), next(self._counter), card_id]
+        self._entries[card_id] = entry
+        heapq.heappush(self._heap, entry)
+        self._prune()
+
+# Hàng đợi của bộ thẻ hiện tại, dựng lại khi bộ thẻ trong session_state đổi
+def get_due_queue():
+    queue = st.session_state.get('due_queue')
+    if queue is None or queue.flashcards is not st.session_state.flashcards:
+        queue = DueQueue(st.session_state.flashcards)
+        st.session_state.due_queue = queue
+    return queue
 
 # Hàm để lấy thẻ tiếp theo
 def next_card():
@@ -6,6 +88,16 @@ def next_card():
     st.session_state.show_back = False
     st.session_state.flipped = False
 
+# Hàm chuyển đến thẻ đến hạn sớm nhất trong hàng đợi, bỏ qua thẻ `skip_card_id` (thẻ
+# vừa trả lời) nếu còn thẻ khác
+def next_due_card(skip_card_id=None):
+    queue = get_due_queue()
+    card = next((card for card in queue.upcoming(2) if card['id'] != skip_card_id), queue.peek())
+    if card is not None:
+        st.session_state.index = queue.positions[card['id']]
+    st.session_state.show_back = False
+    st.session_state.flipped = False
+
 # Hàm để lấy thẻ trước đó
 def prev_card():
     st.session_state.index = (st.session_state.index - 1) % len(st.session_state.flashcards)
@@ -0,0 +1,93 @@
+# utils/prefetch.py
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Sinh trước ghi chú AI cho các thẻ sắp đến hạn: một nhóm luồng nền (tối đa
+# NOTE_PREFETCH_WORKERS lời gọi cùng lúc) sinh ghi chú theo yêu cầu mặc định cho
+# NOTE_PREFETCH_COUNT thẻ đầu hàng đợi, mỗi người học tối đa NOTE_PREFETCH_DAILY_BUDGET
+# lần sinh mỗi ngày. Bấm "Magic" khi ghi chú đã sẵn thì lưu ngay, không phải chờ model.
+# Tắt mặc định; đặt NOTE_PREFETCH=1 để bật.
+
+NOTE_PREFETCH_COUNT = int(os.getenv("NOTE_PREFETCH_COUNT", 5))
+NOTE_PREFETCH_WORKERS = int(os.getenv("NOTE_PREFETCH_WORKERS", 2))
+NOTE_PREFETCH_DAILY_BUDGET = int(os.getenv("NOTE_PREFETCH_DAILY_BUDGET", 100))
+NOTE_PREFETCH_MAX_ENTRIES = 200     # số ghi chú (đã xong hoặc đang sinh) giữ trong bộ nhớ
+DEFAULT_NOTE_REQUEST = "Giải thích cách dùng từ trong ngữ cảnh thực tế và một mẹo ghi nhớ ngắn"
+
+
+def note_prefetch_enabled():
+    return os.getenv("NOTE_PREFETCH", "0").lower() not in ("0", "false", "no", "off")
+
+
+def note_key(card, request):
+    return (card['word'], card['meaning'], card['example'], request)
+
+
+class NotePrefetcher:
+
+    def __init__(self, workers=NOTE_PREFETCH_WORKERS, daily_budget=NOTE_PREFETCH_DAILY_BUDGET, max_entries=NOTE_PREFETCH_MAX_ENTRIES):
+        self.daily_budget = daily_budget
+        self.max_entries = max_entries
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="note-prefetch")
+        self._lock = threading.Lock()
+        self._futures = OrderedDict()
+        self._spent = {}
+        self._day = None
+
+    # Số lần sinh trước `user_id` còn được dùng hôm nay
+    def remaining(self, user_id):
+        with self._lock:
+            self._roll_day()
+            return self.daily_budget - self._spent.get(user_id, 0)
+
+    def _roll_day(self):
+        today = time.strftime('%Y-%m-%d')
+        if self._day != today:
+            self._day = today
+            self._spent = {}
+
+    # Đưa các thẻ chưa có ghi chú (và chưa đang sinh) vào hàng đợi nền, trong giới hạn
+    # ngân sách của `user_id`. Gọi lại nhiều lần với cùng thẻ là rẻ. Trả về số thẻ mới.
+    def schedule(self, user_id, cards, llm, api_key, request=DEFAULT_NOTE_REQUEST):
+        submitted = 0
+        with self._lock:
+            self._roll_day()
+            for card in cards:
+                key = note_key(card, request)
+                if key in self._futures:
+                    self._futures.move_to_end(key)
+                    continue
+                if self._spent.get(user_id, 0) >= self.daily_budget:
+                    break
+                self._spent[user_id] = self._spent.get(user_id, 0) + 1
+                prompt = llm.note_prompt(card, request)
+                self._futures[key] = self._pool.submit(llm.generate, prompt, llm.generation_config, api_key)
+                submitted += 1
+            while len(self._futures) > self.max_entries:
+                self._futures.popitem(last=False)
+        return submitted
+
+    # Lấy ghi chú sinh trước cho (`card`, `request`): chờ tối đa `timeout` giây nếu đang
+    # sinh dở; None nếu chưa từng sinh, chưa xong hoặc bị lỗi (khi đó nên sinh trực tiếp).
+    # Kết quả (kể cả lỗi) vẫn được giữ (LRU, tối đa `max_entries`) để lần vẽ lại sau không
+    # sinh lại thẻ đó và tiêu ngân sách thêm lần nữa.
+    def take(self, card, request, timeout=0):
+        key = note_key(card, request)
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                self._futures.move_to_end(key)
+        if future is None:
+            return None
+        try:
+            return future.result(timeout=timeout) or None
+        except Exception:
+            return None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._futures)
@@ -0,0 +1,139 @@
+# utils/registry.py
+
+import os
+import streamlit as st
+
+# Tài nguyên dùng chung cho cả tiến trình (mô hình lập lịch, LLM, lưu trữ) qua
+# `st.cache_resource`, thay vì mỗi phiên trình duyệt giữ một bản riêng.
+# Đặt SHARED_REGISTRY=0 để quay về cách cũ (mỗi phiên tự nạp vào session_state).
+
+MODEL_PATHS = {
+    "live": "model/sarimax_model.pkl",
+    "table": "model/sarimax_model.pkl",
+    "compact": "model/sarimax_model.json",
+    "online": "model/sarimax_model.json",
+}
+LLM_VERSION = "gemini-1.5-flash"
+# Mô hình lập lịch giữ trong bộ nhớ: tối đa bấy nhiêu bản (chung + riêng từng người học),
+# bản nạp quá SCHEDULER_CACHE_TTL giây bị bỏ và nạp lại (chế độ online đọc lại trạng thái đã lưu)
+SCHEDULER_CACHE_MAX_ENTRIES = int(os.getenv("SCHEDULER_CACHE_MAX_ENTRIES", 256))
+SCHEDULER_CACHE_TTL = int(os.getenv("SCHEDULER_CACHE_TTL", 3600))
+
+
+def registry_enabled():
+    return os.getenv("SHARED_REGISTRY", "1").lower() not in ("0", "false", "no", "off")
+
+# Phiên bản mô hình = chế độ + thời điểm sửa file, nên huấn luyện lại là tự nạp bản mới
+def model_version(mode=None, user_id=None):
+    from utils.schedule import user_model_path
+
+    mode = mode or os.getenv("SCHEDULER_MODE", "live")
+    path = (user_id and user_model_path(user_id)) or MODEL_PATHS.get(mode, MODEL_PATHS["live"])
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        mtime = 0
+    return f"{mode}:{os.path.basename(path)}@{int(mtime)}"
+
+@st.cache_resource(show_spinner=False, max_entries=SCHEDULER_CACHE_MAX_ENTRIES, ttl=SCHEDULER_CACHE_TTL)
+def _shared_scheduler_model(mode, version, user_id=None):
+    from utils.schedule import load_sarimax_model
+    return load_sarimax_model(mode, user_id)
+
+@st.cache_resource(show_spinner=False)
+def _shared_llm(version):
+    from utils.llms import GeminiFlash
+    return GeminiFlash()
+
+@st.cache_resource(show_spinner=False)
+def _shared_supabase(url, key):
+    from supabase import create_client
+    return create_client(url, key)
+
+@st.cache_resource(show_spinner=False)
+def _shared_storage(name, location):
+    from utils.storage import SupabaseBackend, create_storage_backend
+    if name == "supabase":
+        return SupabaseBackend(_shared_supabase(*location))
+    return create_storage_backend(name, location)
+
+@st.cache_resource(show_spinner=False)
+def _shared_feedback_writer(path):
+    from utils.writebehind import FeedbackLog, WriteBehindWriter
+    return WriteBehindWriter(FeedbackLog(path))
+
+@st.cache_resource(show_spinner=False)
+def _shared_note_prefetcher(workers, daily_budget):
+    from utils.prefetch import NotePrefetcher
+    return NotePrefetcher(workers, daily_budget)
+
+# Mô hình lập lịch dùng chung (mô hình riêng của `user_id` nếu đã được huấn luyện)
+def get_scheduler_model(mode=None, user_id=None):
+    mode = mode or os.getenv("SCHEDULER_MODE", "live")
+    if not registry_enabled():
+        if st.session_state.get("sarimax_model_key") != (mode, user_id):
+            from utils.schedule import load_sarimax_model
+            st.session_state.sarimax_model = load_sarimax_model(mode, user_id)
+            st.session_state.sarimax_model_key = (mode, user_id)
+        return st.session_state.sarimax_model
+    from utils.schedule import user_model_path
+
+    # Người học chưa có mô hình riêng dùng chung một bản mô hình chung
+    # (trừ chế độ online, nơi mỗi người học có trạng thái bộ lọc của riêng mình)
+    if user_id and mode != "online" and not user_model_path(user_id):
+        user_id = None
+    return _shared_scheduler_model(mode, model_version(mode, user_id), user_id)
+
+# LLM client dùng chung (GeminiFlash đọc GEMINI_KEY của phiên ở mỗi lần gọi)
+def get_llm():
+    if not registry_enabled():
+        if "llm" not in st.session_state:
+            from utils.llms import GeminiFlash
+            st.session_state.llm = GeminiFlash()
+        return st.session_state.llm
+    return _shared_llm(LLM_VERSION)
+
+# Supabase client dùng chung
+def get_supabase():
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_KEY")
+    if not url or not key:
+        raise ValueError("Supabase URL and Key are missing from environment variables.")
+    return _shared_supabase(url, key)
+
+# Backend lưu trữ dùng chung (STORAGE_BACKEND=supabase|sqlite, xem utils/storage.py)
+def get_storage():
+    from utils.storage import STORAGE_SQLITE_PATH, storage_backend_name
+
+    name = storage_backend_name()
+    if name == "sqlite":
+        return _shared_storage(name, STORAGE_SQLITE_PATH)
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_KEY")
+    if not url or not key:
+        raise ValueError("Supabase URL and Key are missing from environment variables.")
+    return _shared_storage(name, (url, key))
+
+# Hàng đợi ghi sau cho phản hồi ôn tập (một luồng nền cho cả tiến trình)
+def get_feedback_writer():
+    from utils.writebehind import FEEDBACK_LOG_PATH
+    return _shared_feedback_writer(FEEDBACK_LOG_PATH)
+
+# Bộ sinh trước ghi chú AI cho các thẻ sắp đến hạn (một nhóm luồng cho cả tiến trình)
+def get_note_prefetcher():
+    from utils.prefetch import NOTE_PREFETCH_WORKERS, NOTE_PREFETCH_DAILY_BUDGET
+    return _shared_note_prefetcher(NOTE_PREFETCH_WORKERS, NOTE_PREFETCH_DAILY_BUDGET)
+
+# Nạp lại toàn bộ tài nguyên dùng chung ở lần gọi tiếp theo
+def reload_shared_resources():
+    _shared_scheduler_model.clear()
+    _shared_llm.clear()
+    _shared_supabase.clear()
+    _shared_storage.clear()
+
+def registry_versions():
+    return {
+        "scheduler_model": model_version(),
+        "llm": LLM_VERSION,
+        "storage": os.getenv("STORAGE_BACKEND", "supabase").lower(),
+    }
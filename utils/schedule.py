@@ -1,31 +1,262 @@
-import joblib
+import os
+import json
+import threading
 import streamlit as st
+import numpy as np
 import pandas as pd
 from datetime import timedelta, datetime
 
 
+USER_MODEL_DIR = "model/users"
+ONLINE_STATE_DIR = "model/state"
+
+# Khoảng `gold_point` thực tế: điểm -1/0/1 cộng số ngày trễ (tối đa ~2 năm)
+TABLE_MIN_POINT = -250
+TABLE_MAX_POINT = 750
+
+# Sau một lượt ôn, thẻ không được đến hạn lại sớm hơn khoảng này
+MIN_REVIEW_DELAY = timedelta(minutes=10)
+# Khoảng cách mặc định khi không có mô hình lập lịch
+DEFAULT_REVIEW_GAP = timedelta(days=2)
+
+
+# Bảng tra khoảng cách dự báo cho mọi `gold_point` nguyên trong khoảng,
+# mỗi lần ôn chỉ cần tra mảng O(1); ngoài khoảng thì gọi mô hình gốc.
+class IntervalTable:
+
+    def __init__(self, model, min_point=TABLE_MIN_POINT, max_point=TABLE_MAX_POINT):
+        self.model = model
+        self.min_point = min_point
+        self.max_point = max_point
+        self.points = np.arange(min_point, max_point + 1)
+        self.gaps = forecast_gaps(model, self.points)
+
+    def predict_gaps(self, gold_points):
+        gold_points = np.asarray(gold_points, dtype=np.float64)
+        in_table = (gold_points >= self.min_point) & (gold_points <= self.max_point) & (gold_points == np.round(gold_points))
+
+        gaps = np.empty(gold_points.shape, dtype=np.float64)
+        gaps[in_table] = self.gaps[gold_points[in_table].astype(np.int64) - self.min_point]
+        if not in_table.all():
+            gaps[~in_table] = forecast_gaps(self.model, gold_points[~in_table])
+        return gaps
+
+
+# Mô hình SARIMAX dạng gọn (model/sarimax_model.json, xuất từ model/train.py):
+# chỉ gồm hệ số và trạng thái bộ lọc, dự báo 1 bước y = Z·a + β·x bằng NumPy.
+# Một bản được nhiều phiên dùng chung (utils/registry.py) nên đọc/ghi trạng thái qua khóa.
+class CompactSarimax:
+
+    def __init__(self, compact):
+        self.compact = compact
+        self.design = np.asarray(compact["design"], dtype=np.float64)
+        self.exog_params = np.asarray(compact["exog_params"], dtype=np.float64)
+        self.state = np.asarray(compact["predicted_state"], dtype=np.float64)
+        self.state_cov = np.asarray(compact["predicted_state_cov"], dtype=np.float64)
+        self.obs_cov = np.asarray(compact["obs_cov"], dtype=np.float64)
+        self.transition = np.asarray(compact["transition"], dtype=np.float64)
+        self.state_intercept = np.asarray(compact["state_intercept"], dtype=np.float64)
+        selection = np.asarray(compact["selection"], dtype=np.float64)
+        self.selected_state_cov = selection @ np.asarray(compact["state_cov"], dtype=np.float64) @ selection.T
+        self.nobs = compact["nobs"]
+        self._lock = threading.RLock()
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def predict_gaps(self, gold_points):
+        gold_points = np.asarray(gold_points, dtype=np.float64)
+        with self._lock:
+            level = (self.design @ self.state)[0]
+        return level + self.exog_params[0] * gold_points
+
+    # Một bước lọc Kalman cho quan sát mới (khoảng cách `gap_days` với exog `point`),
+    # rồi dự báo trạng thái cho bước kế tiếp. Chi phí O(k_states²), không fit lại.
+    def update(self, gap_days, point):
+        with self._lock:
+            forecast = self.design @ self.state + self.exog_params * point
+            forecast_error = gap_days - forecast
+            forecast_cov = self.design @ self.state_cov @ self.design.T + self.obs_cov
+            gain = self.state_cov @ self.design.T @ np.linalg.inv(forecast_cov)
+
+            filtered_state = self.state + gain @ forecast_error
+            filtered_state_cov = self.state_cov - gain @ self.design @ self.state_cov
+
+            self.state = self.transition @ filtered_state + self.state_intercept
+            self.state_cov = self.transition @ filtered_state_cov @ self.transition.T + self.selected_state_cov
+            self.nobs += 1
+
+
+# Chế độ "online": mô hình gọn của một người học, học tiếp từ mỗi lượt ôn thật.
+# Quan sát giống lúc huấn luyện (model/train.py): khoảng cách giữa hai lượt ôn liên
+# tiếp của một thẻ, với phản hồi ở lượt trước làm `point`. Trạng thái bộ lọc và lượt
+# ôn gần nhất của từng thẻ được lưu gọn ở model/state/<user_id>.json.
+class OnlineSarimax(CompactSarimax):
+
+    def __init__(self, compact, user_id, base_version):
+        super().__init__(compact)
+        self.user_id = user_id
+        self.base_version = base_version
+        self.last_reviews = {}
+
+    @classmethod
+    def load_for_user(cls, path, user_id):
+        model = cls.load_base(path, user_id)
+        try:
+            with open(model.state_path()) as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return model
+
+        # Mô hình gốc đã được huấn luyện lại thì bắt đầu lại từ trạng thái mới
+        if saved.get("base_version") == model.base_version:
+            model.state = np.asarray(saved["predicted_state"], dtype=np.float64)
+            model.state_cov = np.asarray(saved["predicted_state_cov"], dtype=np.float64)
+            model.nobs = saved["nobs"]
+            model.last_reviews = saved["last_reviews"]
+        return model
+
+    @classmethod
+    def load_base(cls, path, user_id):
+        with open(path) as f:
+            compact = json.load(f)
+        return cls(compact, user_id, f"{os.path.basename(path)}@{compact['nobs']}")
+
+    def state_path(self):
+        return os.path.join(ONLINE_STATE_DIR, f"{self.user_id}.json")
+
+    # Cập nhật trạng thái theo các lượt ôn (card_id, reviewed_at, feedback_value)
+    # (cả lô giữ khóa để lượt ôn của hai phiên không xen kẽ nhau)
+    def observe_reviews(self, reviews):
+        with self._lock:
+            for review in sorted(reviews, key=lambda review: review['reviewed_at']):
+                card_id = str(review['card_id'])
+                reviewed_at = pd.Timestamp(review['reviewed_at'])
+                previous = self.last_reviews.get(card_id)
+                if previous:
+                    gap_days = (reviewed_at - pd.Timestamp(previous[0])).total_seconds() / 86400
+                    self.update(gap_days, previous[1])
+                self.last_reviews[card_id] = [reviewed_at.isoformat(), int(review['feedback_value'])]
+
+    def save(self):
+        os.makedirs(ONLINE_STATE_DIR, exist_ok=True)
+        tmp_path = self.state_path() + ".tmp"
+        with self._lock:
+            with open(tmp_path, "w") as f:
+                json.dump({
+                    "base_version": self.base_version,
+                    "nobs": self.nobs,
+                    "predicted_state": self.state.tolist(),
+                    "predicted_state_cov": self.state_cov.tolist(),
+                    "last_reviews": self.last_reviews,
+                }, f)
+            os.replace(tmp_path, self.state_path())
+
+
+# Đường dẫn mô hình riêng mới nhất của người học (do model/train.py ghi), nếu có
+def user_model_path(user_id):
+    try:
+        with open(os.path.join(USER_MODEL_DIR, str(user_id), "LATEST")) as f:
+            version = f.read().strip()
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return os.path.join(USER_MODEL_DIR, str(user_id), f"{version}.json")
+
+
 # Tải mô hình SARIMAX đã lưu
-def load_sarimax_model():
+# mode: "live" (gọi statsmodels mỗi lần dự báo), "table" (bảng tra dựng sẵn)
+# "compact" (đọc file JSON gọn, không nạp statsmodels/scipy) hoặc "online"
+# (bản gọn riêng của người học, cập nhật sau mỗi lần đồng bộ).
+# Nếu `user_id` có mô hình riêng thì dùng mô hình đó thay cho mô hình chung.
+def load_sarimax_model(mode=None, user_id=None):
+    mode = mode or os.getenv("SCHEDULER_MODE", "live")
     try:
+        path = user_model_path(user_id) if user_id else None
+        if mode == "online" and user_id:
+            return OnlineSarimax.load_for_user(path or "model/sarimax_model.json", user_id)
+        if path:
+            model = CompactSarimax.load(path)
+            return IntervalTable(model) if mode == "table" else model
+
+        if mode in ("compact", "online"):
+            return CompactSarimax.load("model/sarimax_model.json")
+
+        import joblib
         model = joblib.load("model/sarimax_model.pkl")
+        if mode == "table":
+            return IntervalTable(model)
         return model
     except FileNotFoundError:
         st.error("Không tìm thấy file mô hình SARIMAX. Vui lòng đảm bảo file mô hình tồn tại.")
         return None
 
+# Tính `gold_point` (exog của mô hình) cho nhiều thẻ cùng lúc
+def compute_gold_points(last_timestamps, current_points, now=None):
+    last_timestamps = pd.DatetimeIndex(pd.to_datetime(last_timestamps))
+    current_points = np.asarray(current_points, dtype=np.int64)
+    now = pd.to_datetime(now if now is not None else datetime.now())
+    days_difference = np.asarray((now - last_timestamps).days, dtype=np.int64)
+
+    return np.where(
+        current_points > -1,
+        current_points + days_difference,
+        current_points - np.round(days_difference / 3).astype(np.int64),
+    )
+
+# Dự báo khoảng cách (ngày) cho nhiều `gold_point` trong một lần gọi
+def forecast_gaps(model, gold_points):
+    gold_points = np.asarray(gold_points, dtype=np.float64)
+    if hasattr(model, "predict_gaps"):
+        return model.predict_gaps(gold_points)
+
+    # Dự báo 1 bước của SARIMAX tuyến tính theo exog của bước đó,
+    # nên chỉ cần hai lần `get_forecast` (point = 0 và 1) cho cả lô.
+    base = model.get_forecast(steps=1, exog=pd.DataFrame({"point": [0]})).predicted_mean.iloc[0]
+    slope = model.get_forecast(steps=1, exog=pd.DataFrame({"point": [1]})).predicted_mean.iloc[0] - base
+    return base + slope * gold_points
+
+# So sánh bảng tra với `get_forecast` gọi riêng cho từng điểm, trả về các điểm lệch
+def verify_interval_table(table):
+    mismatches = []
+    for point, gap in zip(table.points, table.gaps):
+        forecast = table.model.get_forecast(steps=1, exog=pd.DataFrame({"point": [point]}))
+        expected = forecast.predicted_mean.iloc[0]
+        if gap != expected:
+            mismatches.append((int(point), gap, expected))
+    return mismatches
+
+# Hàm dự báo thời gian luyện tập tiếp theo cho nhiều thẻ
+def predict_next_gold_times(model, last_timestamps, current_points, now=None):
+    last_timestamps = pd.DatetimeIndex(pd.to_datetime(last_timestamps))
+    if len(last_timestamps) == 0:
+        return last_timestamps
+
+    gold_points = compute_gold_points(last_timestamps, current_points, now)
+    next_gap_days = forecast_gaps(model, gold_points)
+
+    return last_timestamps + pd.to_timedelta(next_gap_days, unit="D")
+
 # Hàm dự báo thời gian luyện tập tiếp theo
-def predict_next_gold_time(model, last_timestamp, current_point):
-    current_timestamp = pd.to_datetime(datetime.now())
-    days_difference = (current_timestamp - last_timestamp).days
+def predict_next_gold_time(model, last_timestamp, current_point, now=None):
+    return predict_next_gold_times(model, [last_timestamp], [current_point], now)[0]
 
-    gold_point = current_point
-    if current_point > -1:
-        gold_point += days_difference
+# Thời điểm ôn tiếp theo sau các lượt ôn lúc `reviewed_at`: gold_time cũ + khoảng cách dự
+# báo (số ngày trễ đã nằm trong `gold_point`), nhưng không sớm hơn lúc ôn + MIN_REVIEW_DELAY,
+# để thẻ quá hạn trả lời 😱 (khoảng cách âm hoặc gần 0) không còn quá hạn ngay sau đó.
+def next_review_times(model, last_timestamps, current_points, reviewed_at, min_delay=MIN_REVIEW_DELAY):
+    last_timestamps = pd.DatetimeIndex(pd.to_datetime(last_timestamps))
+    if len(last_timestamps) == 0:
+        return last_timestamps
+    reviewed_at = pd.DatetimeIndex(pd.to_datetime(reviewed_at))
+
+    if model is not None:
+        next_times = predict_next_gold_times(model, last_timestamps, current_points, reviewed_at)
     else:
-        gold_point -= round(days_difference / 3)
-        
-    exog_forecast = pd.DataFrame({"point": [gold_point]})
-    forecast = model.get_forecast(steps=1, exog=exog_forecast)
-    next_gap_days = forecast.predicted_mean.iloc[0]
-    
-    return last_timestamp + timedelta(days=next_gap_days)
\ No newline at end of file
+        next_times = last_timestamps + DEFAULT_REVIEW_GAP
+    earliest = reviewed_at + min_delay
+    return next_times.where(next_times > earliest, earliest)
+
+def next_review_time(model, last_timestamp, current_point, reviewed_at):
+    return next_review_times(model, [last_timestamp], [current_point], [reviewed_at])[0]
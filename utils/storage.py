@@ -0,0 +1,550 @@
+# utils/storage.py
+
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+
+# Lớp lưu trữ cho các bảng users, flashcards, notes, study_progress. `utils/database.py`
+# và `utils/auth.py` chỉ gọi qua giao diện `StorageBackend`, nên có thể chạy app (và đo
+# tải) trên Supabase hoặc trên một file SQLite cục bộ:
+#
+#   STORAGE_BACKEND=supabase   (mặc định) dùng SUPABASE_URL / SUPABASE_KEY
+#   STORAGE_BACKEND=sqlite     dùng file STORAGE_SQLITE_PATH (mặc định data/anki.sqlite3)
+#
+# Mọi phương thức nhận `user_id` tường minh (không đọc session_state) và để lỗi nổi lên
+# cho nơi gọi xử lý. Thời gian được truyền dưới dạng chuỗi '%Y-%m-%d %H:%M:%S'.
+
+STORAGE_SQLITE_PATH = os.getenv("STORAGE_SQLITE_PATH", "data/anki.sqlite3")
+
+
+def storage_backend_name():
+    return os.getenv("STORAGE_BACKEND", "supabase").lower()
+
+
+class StorageBackend(ABC):
+
+    # users
+    @abstractmethod
+    def authenticate(self, username, password):
+        ...
+
+    @abstractmethod
+    def create_user(self, username, password, is_admin=False):
+        ...
+
+    # flashcards: `updated_after` chỉ lấy thẻ có `updated_at` mới hơn mốc đó
+    @abstractmethod
+    def list_flashcards(self, user_id, updated_after=None):
+        ...
+
+    # Một trang thẻ theo gold_time tăng dần (thẻ chưa có gold_time cuối, rồi theo id),
+    # trả về (các thẻ, tổng số thẻ của người học)
+    @abstractmethod
+    def list_flashcards_page(self, user_id, offset, limit):
+        ...
+
+    @abstractmethod
+    def add_flashcard(self, user_id, fields):
+        ...
+
+    # Thêm nhiều thẻ trong một lần ghi, trả về các hàng vừa thêm (kèm id)
+    @abstractmethod
+    def add_flashcards(self, user_id, rows):
+        ...
+
+    @abstractmethod
+    def update_flashcard(self, user_id, card_id, fields):
+        ...
+
+    # Gán cùng `fields` cho nhiều thẻ trong một lần ghi
+    @abstractmethod
+    def update_flashcards(self, user_id, card_ids, fields):
+        ...
+
+    # Xóa nhiều thẻ cùng các ghi chú của chúng, số lần gọi không phụ thuộc số thẻ
+    @abstractmethod
+    def delete_flashcards(self, user_id, card_ids):
+        ...
+
+    # Ghi gold_time cho nhiều thẻ trong một lần; `gold_times`: {card_id: chuỗi thời gian}.
+    # Chỉ cập nhật thẻ đang tồn tại (không tạo lại thẻ đã xóa, không chạm cột khác),
+    # trả về tập id đã cập nhật.
+    @abstractmethod
+    def set_gold_times(self, user_id, gold_times):
+        ...
+
+    # notes
+    @abstractmethod
+    def list_notes(self, user_id, flashcard_id=None):
+        ...
+
+    @abstractmethod
+    def add_note(self, user_id, fields):
+        ...
+
+    @abstractmethod
+    def update_note(self, user_id, note_id, fields):
+        ...
+
+    @abstractmethod
+    def delete_note(self, user_id, note_id):
+        ...
+
+    # study_progress: một hàng mỗi (người học, ngày), sắp theo ngày
+    @abstractmethod
+    def list_study_progress(self, user_id):
+        ...
+
+    # Cộng dồn nguyên tử số lượt ôn cho một hoặc nhiều ngày trong một lần gọi.
+    # `progress_by_date`: {date_str: {good_count, normal_count, bad_count}}
+    @abstractmethod
+    def increment_study_progress(self, user_id, progress_by_date):
+        ...
+
+    # Ghi lịch sử ôn (bảng reviews, dữ liệu huấn luyện của model/train.py) và cộng dồn tiến
+    # độ theo từng lượt ôn có id duy nhất, nguyên tử trong một lần gọi. `events`: [{event_id,
+    # card_id, reviewed_at, date, feedback_value}]; lượt ôn đã được ghi trước đó (cùng
+    # event_id) bị bỏ qua, nên gửi lại cả lô sau lỗi hay sau khi tiến trình chết là an toàn.
+    @abstractmethod
+    def record_study_events(self, user_id, events):
+        ...
+
+    # Thống kê tính ở phía kho dữ liệu, chỉ trả về một dòng mỗi nhóm.
+    # Số ghi chú theo thẻ: {flashcard_id: số ghi chú}
+    @abstractmethod
+    def count_notes_by_flashcard(self, user_id):
+        ...
+
+    # Số thẻ theo mức đến hạn so với `now`: quá hạn, trong 1 ngày, trong 1-2 ngày,
+    # còn lại (kể cả thẻ chưa có gold_time) → {'overdue', 'due_1d', 'due_2d', 'later'}
+    @abstractmethod
+    def count_flashcards_by_status(self, user_id, now):
+        ...
+
+
+class SupabaseBackend(StorageBackend):
+
+    def __init__(self, client):
+        self.client = client
+
+    def table(self, name):
+        return self.client.table(name)
+
+    def authenticate(self, username, password):
+        response = self.table('users').select('*').eq('username', username).eq('password', password).execute()
+        return response.data[0] if response.data else None
+
+    def create_user(self, username, password, is_admin=False):
+        response = self.table('users').insert({
+            "username": username,
+            "password": password,
+            "is_admin": is_admin,
+        }).execute()
+        return response.data[0] if response.data else None
+
+    def list_flashcards(self, user_id, updated_after=None):
+        query = self.table('flashcards').select('*').eq('user_id', user_id)
+        if updated_after is not None:
+            query = query.gt('updated_at', updated_after)
+        data = query.execute()
+        return data.data if data.data else []
+
+    def list_flashcards_page(self, user_id, offset, limit):
+        data = self.table('flashcards').select('*', count='exact').eq('user_id', user_id) \
+            .order('gold_time', nullsfirst=False).order('id') \
+            .range(offset, offset + limit - 1).execute()
+        return (data.data if data.data else []), (data.count or 0)
+
+    def add_flashcard(self, user_id, fields):
+        self.table('flashcards').insert({"user_id": user_id, **fields}).execute()
+
+    def add_flashcards(self, user_id, rows):
+        if not rows:
+            return []
+        data = self.table('flashcards').insert([{"user_id": user_id, **fields} for fields in rows]).execute()
+        return data.data if data.data else []
+
+    def update_flashcard(self, user_id, card_id, fields):
+        self.table('flashcards').update(fields).eq('id', card_id).eq('user_id', user_id).execute()
+
+    def update_flashcards(self, user_id, card_ids, fields):
+        self.table('flashcards').update(fields).eq('user_id', user_id).in_('id', list(card_ids)).execute()
+
+    def delete_flashcards(self, user_id, card_ids):
+        card_ids = list(card_ids)
+        self.table('flashcards').delete().eq('user_id', user_id).in_('id', card_ids).execute()
+        self.table('notes').delete().eq('user_id', user_id).in_('flashcard_id', card_ids).execute()  # Remove associated notes
+
+    # Một lời gọi RPC cho cả lô (supabase/migrations/*_set_flashcard_gold_times.sql)
+    def set_gold_times(self, user_id, gold_times):
+        if not gold_times:
+            return set()
+        response = self.client.rpc('set_flashcard_gold_times', {
+            'p_user_id': user_id,
+            'p_gold_times': [{"id": card_id, "gold_time": gold_time} for card_id, gold_time in gold_times.items()],
+        }).execute()
+        return {row['id'] for row in response.data or []}
+
+    def list_notes(self, user_id, flashcard_id=None):
+        query = self.table('notes').select('*').eq('user_id', user_id)
+        if flashcard_id is not None:
+            query = query.eq('flashcard_id', flashcard_id)
+        data = query.execute()
+        return data.data if data.data else []
+
+    def add_note(self, user_id, fields):
+        self.table('notes').insert({"user_id": user_id, **fields}).execute()
+
+    def update_note(self, user_id, note_id, fields):
+        self.table('notes').update(fields).eq('id', note_id).eq('user_id', user_id).execute()
+
+    def delete_note(self, user_id, note_id):
+        self.table('notes').delete().eq('id', note_id).eq('user_id', user_id).execute()
+
+    def list_study_progress(self, user_id):
+        response = self.table('study_progress').select('*').eq('user_id', user_id).order('date').execute()
+        return response.data if response.data else []
+
+    # Một lệnh INSERT ... ON CONFLICT DO UPDATE trên Postgres (hàm RPC trong
+    # supabase/migrations), nên hai lần đồng bộ đồng thời không làm mất lượt ôn
+    def increment_study_progress(self, user_id, progress_by_date):
+        if not progress_by_date:
+            return
+        self.client.rpc('increment_study_progress', {
+            'p_user_id': user_id,
+            'p_days': [
+                {
+                    "date": date_str,
+                    "good_count": counts['good_count'],
+                    "normal_count": counts['normal_count'],
+                    "bad_count": counts['bad_count'],
+                }
+                for date_str, counts in progress_by_date.items()
+            ],
+        }).execute()
+
+    def record_study_events(self, user_id, events):
+        if not events:
+            return
+        self.client.rpc('record_study_events', {
+            'p_user_id': user_id,
+            'p_events': [
+                {
+                    "event_id": event['event_id'],
+                    "card_id": event['card_id'],
+                    "reviewed_at": event['reviewed_at'],
+                    "date": event['date'],
+                    "feedback_value": event['feedback_value'],
+                }
+                for event in events
+            ],
+        }).execute()
+
+    # Các hàm RPC thống kê trong supabase/migrations (GROUP BY / COUNT FILTER trên Postgres)
+    def count_notes_by_flashcard(self, user_id):
+        response = self.client.rpc('note_counts_by_flashcard', {'p_user_id': user_id}).execute()
+        return {row['flashcard_id']: row['note_count'] for row in response.data or []}
+
+    def count_flashcards_by_status(self, user_id, now):
+        response = self.client.rpc('flashcard_status_counts', {'p_user_id': user_id, 'p_now': now}).execute()
+        return response.data[0] if response.data else dict.fromkeys(STATUS_BUCKETS, 0)
+
+
+# Lược đồ cục bộ tương ứng các bảng trên Supabase. Chỉ mục phục vụ các truy vấn nóng:
+# bộ thẻ theo người học (sắp theo gold_time), đồng bộ delta theo updated_at, ghi chú
+# theo thẻ, tiến độ theo (người học, ngày), lịch sử ôn theo người học.
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL UNIQUE,
+    password TEXT NOT NULL,
+    is_admin INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS flashcards (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    word TEXT NOT NULL,
+    meaning TEXT,
+    example TEXT,
+    gold_time TEXT,
+    created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+    updated_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+CREATE INDEX IF NOT EXISTS flashcards_user_id_gold_time ON flashcards (user_id, gold_time);
+CREATE INDEX IF NOT EXISTS flashcards_user_id_updated_at ON flashcards (user_id, updated_at);
+CREATE TRIGGER IF NOT EXISTS flashcards_touch_updated_at AFTER UPDATE ON flashcards
+WHEN NEW.updated_at = OLD.updated_at
+BEGIN
+    UPDATE flashcards SET updated_at = strftime('%Y-%m-%dT%H:%M:%f', 'now') WHERE id = NEW.id;
+END;
+CREATE TABLE IF NOT EXISTS notes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    flashcard_id INTEGER NOT NULL,
+    title TEXT,
+    content TEXT,
+    created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+CREATE INDEX IF NOT EXISTS notes_user_id_flashcard_id ON notes (user_id, flashcard_id);
+CREATE INDEX IF NOT EXISTS notes_flashcard_id ON notes (flashcard_id);
+CREATE TABLE IF NOT EXISTS study_progress (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    good_count INTEGER NOT NULL DEFAULT 0,
+    normal_count INTEGER NOT NULL DEFAULT 0,
+    bad_count INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (user_id, date)
+);
+CREATE TABLE IF NOT EXISTS reviews (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    flashcard_id INTEGER NOT NULL,
+    reviewed_at TEXT NOT NULL,
+    feedback_value INTEGER NOT NULL,
+    event_id TEXT NOT NULL UNIQUE
+);
+CREATE INDEX IF NOT EXISTS reviews_user_id_reviewed_at ON reviews (user_id, reviewed_at);
+CREATE TABLE IF NOT EXISTS study_progress_events (
+    event_id TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL
+);
+"""
+
+FLASHCARD_COLUMNS = ("word", "meaning", "example", "gold_time")
+STATUS_BUCKETS = ("overdue", "due_1d", "due_2d", "later")
+NOTE_COLUMNS = ("flashcard_id", "title", "content")
+# Phản hồi ôn tập (1/0/-1) → cột đếm tương ứng của study_progress
+FEEDBACK_COUNT_COLUMNS = {1: 'good_count', 0: 'normal_count', -1: 'bad_count'}
+
+
+# Backend SQLite cục bộ (WAL): một kết nối dùng chung cho cả tiến trình, khóa theo lệnh
+class SQLiteBackend(StorageBackend):
+
+    def __init__(self, path=STORAGE_SQLITE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SQLITE_SCHEMA)
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    # Chỉ nhận các cột đã biết, tránh ghép tên cột tùy ý vào câu SQL
+    @staticmethod
+    def _columns(fields, allowed):
+        unknown = set(fields) - set(allowed)
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(sorted(unknown))}")
+        return list(fields)
+
+    def authenticate(self, username, password):
+        rows = self._query("SELECT * FROM users WHERE username = ? AND password = ?", (username, password))
+        if not rows:
+            return None
+        rows[0]['is_admin'] = bool(rows[0]['is_admin'])
+        return rows[0]
+
+    def create_user(self, username, password, is_admin=False):
+        cursor = self._execute(
+            "INSERT INTO users (username, password, is_admin) VALUES (?, ?, ?)",
+            (username, password, int(is_admin)),
+        )
+        return {"id": cursor.lastrowid, "username": username, "is_admin": bool(is_admin)}
+
+    def list_flashcards(self, user_id, updated_after=None):
+        if updated_after is None:
+            return self._query("SELECT * FROM flashcards WHERE user_id = ?", (user_id,))
+        return self._query("SELECT * FROM flashcards WHERE user_id = ? AND updated_at > ?", (user_id, updated_after))
+
+    def list_flashcards_page(self, user_id, offset, limit):
+        rows = self._query(
+            "SELECT * FROM flashcards WHERE user_id = ? ORDER BY gold_time IS NULL, gold_time, id LIMIT ? OFFSET ?",
+            (user_id, limit, offset),
+        )
+        total = self._query("SELECT COUNT(*) AS total FROM flashcards WHERE user_id = ?", (user_id,))[0]['total']
+        return rows, total
+
+    def add_flashcard(self, user_id, fields):
+        columns = self._columns(fields, FLASHCARD_COLUMNS)
+        self._execute(
+            f"INSERT INTO flashcards (user_id, {', '.join(columns)}) VALUES (?{', ?' * len(columns)})",
+            (user_id, *(fields[column] for column in columns)),
+        )
+
+    def add_flashcards(self, user_id, rows):
+        inserted = []
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN")
+                for fields in rows:
+                    columns = self._columns(fields, FLASHCARD_COLUMNS)
+                    cursor = self._conn.execute(
+                        f"INSERT INTO flashcards (user_id, {', '.join(columns)}) VALUES (?{', ?' * len(columns)}) RETURNING *",
+                        (user_id, *(fields[column] for column in columns)),
+                    )
+                    inserted.append(dict(cursor.fetchone()))
+        return inserted
+
+    def update_flashcard(self, user_id, card_id, fields):
+        columns = self._columns(fields, FLASHCARD_COLUMNS)
+        if not columns:
+            return
+        assignments = ", ".join(f"{column} = ?" for column in columns)
+        self._execute(
+            f"UPDATE flashcards SET {assignments} WHERE id = ? AND user_id = ?",
+            (*(fields[column] for column in columns), card_id, user_id),
+        )
+
+    def update_flashcards(self, user_id, card_ids, fields):
+        card_ids = list(card_ids)
+        columns = self._columns(fields, FLASHCARD_COLUMNS)
+        if not columns or not card_ids:
+            return
+        assignments = ", ".join(f"{column} = ?" for column in columns)
+        self._execute(
+            f"UPDATE flashcards SET {assignments} WHERE user_id = ? AND id IN ({', '.join('?' * len(card_ids))})",
+            (*(fields[column] for column in columns), user_id, *card_ids),
+        )
+
+    def delete_flashcards(self, user_id, card_ids):
+        card_ids = list(card_ids)
+        if not card_ids:
+            return
+        placeholders = ", ".join("?" * len(card_ids))
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._conn.execute(f"DELETE FROM flashcards WHERE user_id = ? AND id IN ({placeholders})", (user_id, *card_ids))
+                self._conn.execute(f"DELETE FROM notes WHERE user_id = ? AND flashcard_id IN ({placeholders})", (user_id, *card_ids))
+
+    # Một giao dịch cho cả lô; thẻ đã bị xóa thì UPDATE không chạm hàng nào
+    def set_gold_times(self, user_id, gold_times):
+        updated = set()
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN")
+                for card_id, gold_time in gold_times.items():
+                    cursor = self._conn.execute(
+                        "UPDATE flashcards SET gold_time = ? WHERE id = ? AND user_id = ?",
+                        (gold_time, card_id, user_id),
+                    )
+                    if cursor.rowcount:
+                        updated.add(card_id)
+        return updated
+
+    def list_notes(self, user_id, flashcard_id=None):
+        if flashcard_id is None:
+            return self._query("SELECT * FROM notes WHERE user_id = ?", (user_id,))
+        return self._query("SELECT * FROM notes WHERE user_id = ? AND flashcard_id = ?", (user_id, flashcard_id))
+
+    def add_note(self, user_id, fields):
+        columns = self._columns(fields, NOTE_COLUMNS)
+        self._execute(
+            f"INSERT INTO notes (user_id, {', '.join(columns)}) VALUES (?{', ?' * len(columns)})",
+            (user_id, *(fields[column] for column in columns)),
+        )
+
+    def update_note(self, user_id, note_id, fields):
+        columns = self._columns(fields, NOTE_COLUMNS)
+        if not columns:
+            return
+        assignments = ", ".join(f"{column} = ?" for column in columns)
+        self._execute(
+            f"UPDATE notes SET {assignments} WHERE id = ? AND user_id = ?",
+            (*(fields[column] for column in columns), note_id, user_id),
+        )
+
+    def delete_note(self, user_id, note_id):
+        self._execute("DELETE FROM notes WHERE id = ? AND user_id = ?", (note_id, user_id))
+
+    def list_study_progress(self, user_id):
+        return self._query("SELECT * FROM study_progress WHERE user_id = ? ORDER BY date", (user_id,))
+
+    def increment_study_progress(self, user_id, progress_by_date):
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._add_study_progress(user_id, progress_by_date)
+
+    # Chỉ lượt ôn chưa có trong study_progress_events được cộng, cùng giao dịch với việc ghi id
+    def record_study_events(self, user_id, events):
+        progress_by_date = {}
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN")
+                for event in events:
+                    cursor = self._conn.execute(
+                        "INSERT OR IGNORE INTO study_progress_events (event_id, user_id) VALUES (?, ?)",
+                        (event['event_id'], user_id),
+                    )
+                    if not cursor.rowcount:
+                        continue
+                    self._conn.execute(
+                        "INSERT OR IGNORE INTO reviews (user_id, flashcard_id, reviewed_at, feedback_value, event_id) VALUES (?, ?, ?, ?, ?)",
+                        (user_id, event['card_id'], event['reviewed_at'], event['feedback_value'], event['event_id']),
+                    )
+                    if event['feedback_value'] not in FEEDBACK_COUNT_COLUMNS:
+                        continue
+                    counts = progress_by_date.setdefault(event['date'], {'good_count': 0, 'normal_count': 0, 'bad_count': 0})
+                    counts[FEEDBACK_COUNT_COLUMNS[event['feedback_value']]] += 1
+                self._add_study_progress(user_id, progress_by_date)
+
+    def _add_study_progress(self, user_id, progress_by_date):
+        self._conn.executemany(
+            "INSERT INTO study_progress (user_id, date, good_count, normal_count, bad_count) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (user_id, date) DO UPDATE SET "
+            "good_count = good_count + excluded.good_count, "
+            "normal_count = normal_count + excluded.normal_count, "
+            "bad_count = bad_count + excluded.bad_count",
+            [
+                (user_id, date_str, counts['good_count'], counts['normal_count'], counts['bad_count'])
+                for date_str, counts in progress_by_date.items()
+            ],
+        )
+
+    def count_notes_by_flashcard(self, user_id):
+        rows = self._query(
+            "SELECT flashcard_id, COUNT(*) AS note_count FROM notes WHERE user_id = ? GROUP BY flashcard_id",
+            (user_id,),
+        )
+        return {row['flashcard_id']: row['note_count'] for row in rows}
+
+    # gold_time lưu dạng '%Y-%m-%d %H:%M:%S' nên so sánh chuỗi đúng thứ tự thời gian
+    def count_flashcards_by_status(self, user_id, now):
+        now = datetime.strptime(now, '%Y-%m-%d %H:%M:%S')
+        bounds = [(now + timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S') for days in (0, 1, 2)]
+        rows = self._query(
+            "SELECT"
+            " COALESCE(SUM(gold_time < ?), 0) AS overdue,"
+            " COALESCE(SUM(gold_time >= ? AND gold_time <= ?), 0) AS due_1d,"
+            " COALESCE(SUM(gold_time > ? AND gold_time <= ?), 0) AS due_2d,"
+            " COALESCE(SUM(gold_time IS NULL OR gold_time > ?), 0) AS later"
+            " FROM flashcards WHERE user_id = ?",
+            (bounds[0], bounds[0], bounds[1], bounds[1], bounds[2], bounds[2], user_id),
+        )
+        return rows[0]
+
+
+# Tạo backend theo tên; `location` là file SQLite hoặc (url, key) của Supabase
+def create_storage_backend(name, location):
+    if name == "sqlite":
+        return SQLiteBackend(location)
+    if name == "supabase":
+        from supabase import create_client
+        url, key = location
+        return SupabaseBackend(create_client(url, key))
+    raise ValueError(f"Unknown storage backend: {name}")
@@ -0,0 +1,200 @@
+# utils/writebehind.py
+
+import os
+import json
+import time
+import uuid
+import random
+import sqlite3
+import threading
+import pandas as pd
+
+# Hàng đợi ghi sau (write-behind) cho phản hồi ôn tập: mỗi lượt ôn được ghi ngay vào
+# một log SQLite cục bộ (bền qua việc đóng tab hay khởi động lại tiến trình), rồi một
+# luồng nền gom theo lô và đẩy lên Supabase, thử lại với backoff lũy thừa khi lỗi.
+# Bấm phản hồi vì thế không bao giờ phải chờ mạng. Mỗi sự kiện có một `event_id` ngẫu
+# nhiên để phía máy chủ bỏ qua sự kiện đã ghi khi một lô được gửi lại.
+
+FEEDBACK_LOG_PATH = os.getenv("FEEDBACK_LOG_PATH", "data/feedback_log.sqlite3")
+FLUSH_INTERVAL = 5          # giây giữa hai lần đẩy định kỳ
+FLUSH_BATCH_SIZE = 500      # số sự kiện tối đa mỗi lần đẩy
+RETRY_BASE_DELAY = 1        # giây, nhân đôi sau mỗi lần lỗi liên tiếp
+RETRY_MAX_DELAY = 300
+
+
+def write_behind_enabled():
+    return os.getenv("WRITE_BEHIND", "1").lower() not in ("0", "false", "no", "off")
+
+
+# Log sự kiện bền vững trên SQLite (WAL), an toàn khi nhiều luồng cùng dùng
+class FeedbackLog:
+
+    def __init__(self, path=FEEDBACK_LOG_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS feedback_events ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " user_id TEXT NOT NULL,"
+            " card_id TEXT NOT NULL,"
+            " gold_time TEXT NOT NULL,"
+            " reviewed_at TEXT NOT NULL,"
+            " feedback_value INTEGER NOT NULL,"
+            " event_uid TEXT)"
+        )
+        # Log tạo trước khi có event_uid: thêm cột và cấp id cho sự kiện còn chờ
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(feedback_events)")]
+        if "event_uid" not in columns:
+            self._conn.execute("ALTER TABLE feedback_events ADD COLUMN event_uid TEXT")
+        self._conn.execute("UPDATE feedback_events SET event_uid = lower(hex(randomblob(16))) WHERE event_uid IS NULL")
+
+    def append(self, user_id, card_id, gold_time, reviewed_at, feedback_value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO feedback_events (user_id, card_id, gold_time, reviewed_at, feedback_value, event_uid) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    json.dumps(user_id),
+                    json.dumps(card_id),
+                    pd.Timestamp(gold_time).isoformat(),
+                    pd.Timestamp(reviewed_at).isoformat(),
+                    int(feedback_value),
+                    uuid.uuid4().hex,
+                ),
+            )
+
+    # Sự kiện còn chờ theo thứ tự ghi, bỏ qua người học trong `exclude_user_ids`
+    def pending(self, limit=FLUSH_BATCH_SIZE, exclude_user_ids=()):
+        excluded = [json.dumps(user_id) for user_id in exclude_user_ids]
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, user_id, card_id, gold_time, reviewed_at, feedback_value, event_uid FROM feedback_events"
+                f" WHERE user_id NOT IN ({', '.join('?' * len(excluded))}) ORDER BY id LIMIT ?",
+                (*excluded, limit),
+            ).fetchall()
+        return [
+            {
+                'id': row[0],
+                'user_id': json.loads(row[1]),
+                'card_id': json.loads(row[2]),
+                'gold_time': pd.Timestamp(row[3]),
+                'reviewed_at': pd.Timestamp(row[4]),
+                'feedback_value': row[5],
+                'event_id': row[6],
+            }
+            for row in rows
+        ]
+
+    def count(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                return self._conn.execute("SELECT COUNT(*) FROM feedback_events").fetchone()[0]
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM feedback_events WHERE user_id = ?", (json.dumps(user_id),)
+            ).fetchone()[0]
+
+    def remove(self, event_ids):
+        with self._lock:
+            self._conn.executemany("DELETE FROM feedback_events WHERE id = ?", [(event_id,) for event_id in event_ids])
+
+
+# Đẩy các sự kiện của một người học lên Supabase: gold_time (ghi theo lô, idempotent), rồi
+# lịch sử ôn (bảng reviews) và study_progress theo từng event_id (sự kiện đã ghi bị bỏ
+# qua), nên thử lại là an toàn.
+def flush_user_events(user_id, events):
+    from utils.database import write_gold_times, record_study_events
+
+    write_gold_times(user_id, [(event['card_id'], event['gold_time']) for event in events])
+    record_study_events(user_id, [
+        {
+            'event_id': event['event_id'],
+            'card_id': event['card_id'],
+            'reviewed_at': event['reviewed_at'].strftime('%Y-%m-%d %H:%M:%S'),
+            'date': event['reviewed_at'].strftime('%Y-%m-%d'),
+            'feedback_value': event['feedback_value'],
+        }
+        for event in events
+    ])
+
+
+# Luồng nền đẩy log lên Supabase định kỳ hoặc khi được yêu cầu (`flush_now`)
+class WriteBehindWriter:
+
+    def __init__(self, log, flush=flush_user_events, interval=FLUSH_INTERVAL):
+        self.log = log
+        self.flush = flush
+        self.interval = interval
+        self.failures = 0
+        self.last_error = None
+        self._wake = threading.Event()
+        self._idle = threading.Condition()
+        self._flushing = False
+        self._thread = threading.Thread(target=self._run, name="feedback-write-behind", daemon=True)
+        self._thread.start()
+
+    # Ghi bền vào log rồi trả về ngay; luồng nền sẽ đẩy lên sau
+    def enqueue(self, user_id, feedback):
+        self.log.append(user_id, feedback['card_id'], feedback['gold_time'], feedback['reviewed_at'], feedback['feedback_value'])
+
+    # Đánh thức luồng nền; `timeout` > 0 thì chờ tới khi log (của `user_id`, nếu có)
+    # trống hoặc hết giờ. Trả về số sự kiện còn chờ.
+    def flush_now(self, timeout=0, user_id=None):
+        self._wake.set()
+        deadline = time.monotonic() + timeout
+        with self._idle:
+            while (self.log.count(user_id) or self._flushing) and time.monotonic() < deadline:
+                self._idle.wait(max(0.0, min(0.1, deadline - time.monotonic())))
+        return self.log.count(user_id)
+
+    def _delay(self):
+        if not self.failures:
+            return self.interval
+        backoff = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (self.failures - 1))
+        return backoff * random.uniform(0.5, 1.0)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self._delay())
+            self._wake.clear()
+            self._drain()
+
+    # Đẩy và xóa khỏi log theo từng người học ngay khi người đó ghi xong, nên lỗi của một
+    # người không làm gửi lại sự kiện của người khác. Người học bị lỗi được bỏ qua tới hết
+    # lượt này (rồi thử lại sau backoff) để không chặn những người còn lại.
+    def _drain(self):
+        failed_users = set()
+        while True:
+            events = self.log.pending(exclude_user_ids=failed_users)
+            if not events:
+                break
+            by_user = {}
+            for event in events:
+                by_user.setdefault(event['user_id'], []).append(event)
+
+            for user_id, user_events in by_user.items():
+                with self._idle:
+                    self._flushing = True
+                try:
+                    self.flush(user_id, user_events)
+                    self.log.remove([event['id'] for event in user_events])
+                except Exception as e:
+                    failed_users.add(user_id)
+                    self.last_error = str(e)
+                    print(f"Error flushing feedback log for user {user_id}: {e}")
+                finally:
+                    with self._idle:
+                        self._flushing = False
+                        self._idle.notify_all()
+
+        if failed_users:
+            self.failures += 1
+        else:
+            self.failures = 0
+            self.last_error = None
+        with self._idle:
+            self._idle.notify_all()